@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ai.neural_network import InputMatrix, OutputMatrix
+
+
+Rewards = np.ndarray[Any, Any]
+Chunk = Tuple[InputMatrix, OutputMatrix, Rewards]
+
+
+class ExperienceBuffer:
+    """
+    This stores rows of (state, action probabilities, reward) in preallocated chunks, so an append is one row copy.
+    Once the chunks held in memory would exceed the memory budget in bytes,
+    each full chunk is written to memory-mapped files and only read back from disk. The files go in a temporary
+    directory of the buffer's own, made in the spill directory if one is given, so buffers can share a spill
+    directory. It is deleted when the buffer is cleared, closed or garbage collected, or when the interpreter exits.
+    """
+
+    def __init__(self, number_of_features: int, number_of_targets: int, chunk_size: int = 2 ** 16,
+                 memory_budget: int = 2 ** 30, spill_directory: Optional[str] = None,
+                 state_dtype: Any = int, action_dtype: Any = float, reward_dtype: Any = int):
+        if chunk_size < 1:
+            raise ValueError('The argument "chunk_size" must be a positive integer.')
+        self.number_of_features = number_of_features
+        self.number_of_targets = number_of_targets
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget
+        self.spill_directory = spill_directory
+        self.dtypes = np.dtype(state_dtype), np.dtype(action_dtype), np.dtype(reward_dtype)
+        self._chunks: List[Chunk] = []
+        self._chunks_in_memory = 0
+        self._directory: Optional[str] = None  # This is the directory of this buffer's spilled files.
+        self._finalizer: Optional[weakref.finalize] = None
+        self._states, self._actions, self._rewards = self._new_chunk()
+        self._size = 0
+
+    def __enter__(self) -> 'ExperienceBuffer':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+        return None
+
+    def __len__(self) -> int:
+        return len(self._chunks) * self.chunk_size + self._size
+
+    @property
+    def actions(self) -> OutputMatrix:
+        return self._concatenate(1)
+
+    @property
+    def rewards(self) -> Rewards:
+        return self._concatenate(2)
+
+    @property
+    def spilled(self) -> int:
+        """This is the number of rows on disk."""
+        return (len(self._chunks) - self._chunks_in_memory) * self.chunk_size
+
+    @property
+    def states(self) -> InputMatrix:
+        return self._concatenate(0)
+
+    def append(self, state: Any, action: Any, reward: Any) -> None:
+        if self._size == self.chunk_size:
+            self._next_chunk()
+        self._states[self._size] = state
+        self._actions[self._size] = action
+        self._rewards[self._size] = reward
+        self._size += 1
+        return None
+
+    def chunks(self) -> Iterator[Chunk]:
+        """This yields the rows chunk by chunk, without copying, so the buffer can be read with bounded memory."""
+        yield from self._chunks
+        if self._size:
+            yield self._states[:self._size], self._actions[:self._size], self._rewards[:self._size]
+
+    def clear(self) -> None:
+        """This drops every row and deletes the files this buffer spilled."""
+        self._chunks, self._chunks_in_memory = [], 0
+        if self._finalizer is not None:
+            self._finalizer()
+            self._directory, self._finalizer = None, None
+        self._size = 0
+        return None
+
+    def close(self) -> None:
+        """This is the same as clear, for use as a context manager."""
+        self.clear()
+        return None
+
+    def extend(self, states: InputMatrix, actions: OutputMatrix, rewards: Rewards) -> None:
+        """This appends many rows with one slice copy per chunk they fill."""
+        start = 0
+        while start < len(rewards):
+            if self._size == self.chunk_size:
+                self._next_chunk()
+            stop = min(len(rewards), start + self.chunk_size - self._size)
+            rows = slice(self._size, self._size + stop - start)
+            self._states[rows], self._actions[rows], self._rewards[rows] = \
+                states[start:stop], actions[start:stop], rewards[start:stop]
+            self._size += stop - start
+            start = stop
+        return None
+
+    def _concatenate(self, field: int) -> np.ndarray:
+        return np.concatenate([chunk[field] for chunk in self.chunks()]) if len(self) else \
+            self._new_chunk(0)[field]
+
+    def _new_chunk(self, size: Optional[int] = None) -> Chunk:
+        size = self.chunk_size if size is None else size
+        state_dtype, action_dtype, reward_dtype = self.dtypes
+        return (np.empty((size, self.number_of_features), dtype=state_dtype),
+                np.empty((size, self.number_of_targets), dtype=action_dtype),
+                np.empty(size, dtype=reward_dtype))
+
+    def _next_chunk(self) -> None:
+        full_chunk = self._states, self._actions, self._rewards
+        chunk_bytes = sum(array.nbytes for array in full_chunk)
+        # The full chunk, the ones before it and the next one must all fit in the memory budget.
+        if (self._chunks_in_memory + 2) * chunk_bytes > self.memory_budget:
+            # The spilled rows are copied to disk, so the arrays in memory are written over by the next chunk.
+            self._chunks.append(self._spill(full_chunk))
+        else:
+            self._chunks.append(full_chunk)
+            self._chunks_in_memory += 1
+            self._states, self._actions, self._rewards = self._new_chunk()
+        self._size = 0
+        return None
+
+    def _spill(self, chunk: Chunk) -> Chunk:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='experience_', dir=self.spill_directory)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._directory, ignore_errors=True)
+        spilled = []
+        for name, array in zip(['states', 'actions', 'rewards'], chunk):
+            path = os.path.join(self._directory, f'experience_{len(self._chunks)}_{name}.npy')
+            np.save(path, array)
+            spilled.append(np.load(path, mmap_mode='r'))
+        return tuple(spilled)
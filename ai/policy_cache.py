@@ -0,0 +1,60 @@
+from typing import Any, Sequence
+
+import numpy as np
+
+from ai.neural_network import InputMatrix, NeuralNetwork, OutputMatrix
+
+
+class PolicyCache:
+    """
+    This is a lookup table of the outputs of a neural network for every integer state between low and high,
+    so propagating a state that is in the table is an array index.
+    The table is rebuilt on the next lookup after the version of the network changes,
+    which happens when it is initialized or trained. After changing the weights any other way, call invalidate.
+    """
+
+    def __init__(self, neural_network: NeuralNetwork, low: Sequence[int], high: Sequence[int]):
+        self.neural_network = neural_network
+        self.low = np.asarray(low, dtype=np.int64)
+        self.sizes = np.asarray(high, dtype=np.int64) - self.low + 1
+        if (self.sizes < 1).any():
+            raise ValueError('Every value of the argument "high" must be at least the value of "low".')
+        # The table is flat, with the last feature changing fastest.
+        self.strides = np.append(np.cumprod(self.sizes[:0:-1])[::-1], 1)
+        self.table: OutputMatrix = np.empty((0, 0))
+        self._version = None
+        self._low, self._sizes = self.low.tolist(), self.sizes.tolist()
+
+    def forward_propagation(self, L: InputMatrix) -> OutputMatrix:
+        if self._version != self.neural_network.version:
+            self._build()
+        offset = np.asarray(L, dtype=np.int64) - self.low
+        inside = ((offset >= 0) & (offset < self.sizes)).all(axis=1)
+        if inside.all():
+            return self.table[offset @ self.strides]
+        output = np.empty((len(offset), self.table.shape[1]), dtype=self.table.dtype)
+        output[inside] = self.table[offset[inside] @ self.strides]
+        output[~inside] = self.neural_network.forward_propagation(np.asarray(L)[~inside])
+        return output
+
+    def invalidate(self) -> None:
+        self._version = None
+        return None
+
+    def lookup(self, state: Sequence[int]) -> np.ndarray[Any, float]:
+        """This is the output for one state, without any array arithmetic."""
+        if self._version != self.neural_network.version:
+            self._build()
+        index = 0
+        for value, low, size in zip(np.asarray(state).tolist(), self._low, self._sizes):
+            value -= low
+            if not 0 <= value < size:
+                return self.neural_network.forward_propagation(np.array([state]))[0]
+            index = index * size + value
+        return self.table[index]
+
+    def _build(self) -> None:
+        grid = np.indices(self.sizes).reshape(len(self.sizes), -1).T + self.low
+        self.table = self.neural_network.forward_propagation(grid)
+        self._version = self.neural_network.version
+        return None
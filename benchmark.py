@@ -0,0 +1,179 @@
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from numpy.random import default_rng
+
+from ai.neural_network import MultilayerPerceptron
+from blackjack import Card, Deck, Hand, Table
+from blackjack_robots.basic_strategy import BasicStrategy
+from blackjack_robots.card_counter import CardCounter
+from blackjack_robots.reinforcement_learner import ReinforcementLearner
+from blackjack_simulations.batch_simulator import BatchSimulator
+
+
+# A benchmark does a fixed amount of work and returns how many units it did and the seconds it took.
+Benchmark = Callable[[], Tuple[int, float]]
+Results = Dict[str, Dict[str, float]]
+# This is the committed baseline, which is regenerated with --output when the benchmarks or the machine change.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+
+def table(robot: Type[BasicStrategy], rounds: int = 20000) -> Benchmark:
+    def benchmark() -> Tuple[int, float]:
+        np.random.seed(0)
+        player = ReinforcementLearner(MultilayerPerceptron([30])) if robot is ReinforcementLearner else robot()
+        player.chips = 2 ** 40
+        table_ = Table(players=1, decks=6, minimum_bet=25, penetration=0.75, rng=default_rng(0))
+        table_.players = [player]
+        start = perf_counter()
+        table_.simulate(lambda: player.rounds < rounds)
+        return rounds, perf_counter() - start
+    return benchmark
+
+
+def batch_simulator(shoes: int = 10000, rounds: int = 300) -> Tuple[int, float]:
+    simulator = BatchSimulator(shoes, chips=2 ** 40, seed=0)
+    start = perf_counter()
+    simulator.play(rounds)
+    return shoes * rounds, perf_counter() - start
+
+
+def deck_add(decks: int = 6, repeat: int = 300) -> Tuple[int, float]:
+    cards = [Card(rank, suit) for _ in range(decks) for rank in sorted(Deck.ranks) for suit in sorted(Deck.suits)]
+    start = perf_counter()
+    for _ in range(repeat):
+        deck = Deck(default_rng(0))
+        for i in range(0, len(cards), 4):
+            deck.add(*cards[i:i + 4])
+    return repeat * len(cards), perf_counter() - start
+
+
+def deck_shuffle(decks: int = 6, repeat: int = 5000) -> Tuple[int, float]:
+    deck = Deck(default_rng(0))
+    for _ in range(decks):
+        deck.generate()
+    start = perf_counter()
+    for _ in range(repeat):
+        deck.shuffle()
+    return repeat, perf_counter() - start
+
+
+def hand_evaluation(repeat: int = 100000) -> Tuple[int, float]:
+    rng = default_rng(0)
+    ranks = sorted(Deck.ranks)
+    hands = [[Card(ranks[i], 'S') for i in rng.integers(0, len(ranks), size=3)] for _ in range(1000)]
+    dealer = Hand(Card('10', 'H'), Card('7', 'H'))
+    start = perf_counter()
+    for i in range(repeat):
+        hand = Hand(*hands[i % len(hands)][:2])
+        hand.add(hands[i % len(hands)][2])
+        hand.total(), hand.blackjack(), hand.bust(), hand.pair(), hand.beat(dealer), hand.tie_with(dealer)
+    return repeat, perf_counter() - start
+
+
+def mlp_forward(rows: int = 1024, repeat: int = 2000) -> Tuple[int, float]:
+    np.random.seed(0)
+    network = MultilayerPerceptron([30])
+    network.initialize(6, 5)
+    X = np.random.randint(0, 22, size=(rows, 6))
+    start = perf_counter()
+    for _ in range(repeat):
+        network.forward_propagation(X)
+    return rows * repeat, perf_counter() - start
+
+
+def mlp_forward_single(repeat: int = 50000) -> Tuple[int, float]:
+    np.random.seed(0)
+    network = MultilayerPerceptron([30])
+    network.initialize(6, 5)
+    X = np.random.randint(0, 22, size=(1, 6))
+    start = perf_counter()
+    for _ in range(repeat):
+        network.forward_propagation(X)
+    return repeat, perf_counter() - start
+
+
+def mlp_train(rows: int = 300000, batch_size: int = 64) -> Tuple[int, float]:
+    np.random.seed(0)
+    X, Y = np.random.rand(rows, 6), np.random.rand(rows, 5)
+    network = MultilayerPerceptron([30])
+    start = perf_counter()
+    with redirect_stdout(StringIO()):
+        network.train(X, Y, batch_size=batch_size, max_epoch=1, max_time_seconds=600)
+    return rows, perf_counter() - start
+
+
+BENCHMARKS: Dict[str, Tuple[Benchmark, str]] = {
+    'table_basic_strategy': (table(BasicStrategy), 'rounds/s'),
+    'table_card_counter': (table(CardCounter), 'rounds/s'),
+    'table_reinforcement_learner': (table(ReinforcementLearner), 'rounds/s'),
+    'batch_simulator': (batch_simulator, 'rounds/s'),
+    'deck_add': (deck_add, 'cards/s'),
+    'deck_shuffle': (deck_shuffle, 'shuffles/s'),
+    'hand_evaluation': (hand_evaluation, 'hands/s'),
+    'mlp_forward': (mlp_forward, 'samples/s'),
+    'mlp_forward_single': (mlp_forward_single, 'calls/s'),
+    'mlp_train': (mlp_train, 'samples/s'),
+}
+
+
+def run_benchmarks(names: Optional[List[str]] = None, repeat: int = 3) -> Results:
+    """Every benchmark is run a number of times and the best rate is kept, which is the least noisy."""
+    results = {}
+    for name in names or list(BENCHMARKS):
+        benchmark, unit = BENCHMARKS[name]
+        rate = max(units / seconds for units, seconds in (benchmark() for _ in range(repeat)))
+        results[name] = {'value': rate, 'unit': unit}
+    return results
+
+
+def compare(results: Results, baseline: Results, tolerance: float = 0.1) -> Dict[str, Tuple[float, bool]]:
+    """This returns each result as a ratio of the baseline and whether it regressed by more than the tolerance."""
+    return {name: (result['value'] / baseline[name]['value'],
+                   result['value'] / baseline[name]['value'] < 1.0 - tolerance)
+            for name, result in results.items() if name in baseline}
+
+
+def load_results(path: str) -> Results:
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def save_results(results: Results, path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump({'python': sys.version.split()[0], 'numpy': np.__version__, 'results': results}, file, indent=1)
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description='This measures the throughput of the engine, the robots and the network.')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help='the benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='the JSON file the results are written to')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='a JSON file of earlier results to compare against, or an empty string for none')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='the fraction a result may drop')
+    args = parser.parse_args(argv)
+    baseline = load_results(args.baseline) if args.baseline else {}
+    results = run_benchmarks(args.only, args.repeat)
+    if args.output:
+        save_results(results, args.output)
+    comparison = compare(results, baseline, args.tolerance)
+    for name, result in results.items():
+        line = f"{name:<30}{result['value']:>16,.0f} {result['unit']}"
+        if name in comparison:
+            ratio, regressed = comparison[name]
+            line += f"  {ratio:.2f}x baseline{'  REGRESSION' if regressed else ''}"
+        print(line)
+    return int(any(regressed for _, regressed in comparison.values()))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,33 @@
-from random import randint, uniform
-from time import sleep
-from typing import Any, Callable, Dict, Text, List, Tuple, Union
+from operator import add
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, NamedTuple, Text, List, Optional, Tuple, Union
 
-from numpy import any as npany, array, all as npall, max as npmax, min as npmin, ndarray
+from numpy import arange, array, concatenate, empty, fromiter, ndarray
+from numpy.random import PCG64, Generator, SeedSequence, default_rng
+
+from round_log import RoundLog
+from shoe_corpus import CARDS_PER_DECK, ShoeCorpus
 
 
 IntArray = ndarray[Any, int]
+CardArray = ndarray[Any, object]
 
 
 class Card:
+    __slots__ = ('rank', 'suit', 'face_up', 'ace', 'hard_value', 'max_value', '_value')
     rank_map = {'A': array([11, 1], dtype=int), 'K': 10, 'Q': 10, 'J': 10, '10': 10,
                 '9': 9, '8': 8, '7': 7, '6': 6, '5': 5, '4': 4, '3': 3, '2': 2}
+    # Aces count one in the hard value and eleven in the maximum value.
+    hard_value_map = {'A': 1, 'K': 10, 'Q': 10, 'J': 10, '10': 10,
+                      '9': 9, '8': 8, '7': 7, '6': 6, '5': 5, '4': 4, '3': 3, '2': 2}
 
     def __init__(self, rank: str, suit: Text, face_up=False):
         self.rank = rank
         self.suit = suit
         self.face_up = face_up
         self.ace = rank == 'A'
+        self.hard_value = self.hard_value_map[rank]
+        self.max_value = 11 if self.ace else self.hard_value
         self._value: Union[IntArray, int] = self.rank_map[rank]
 
     def get_value(self) -> Union[IntArray, int]:
@@ -31,34 +42,44 @@ class Card:
 
 
 class Hand:
+    """
+    The value of a hand is kept as plain integers: the hard total of its face-up cards, counting aces as one,
+    and a soft flag, which is one when a face-up ace can add ten more.
+    """
+    __slots__ = ('cards', 'bet', 'hard', 'soft')
 
     def __init__(self, *args: Card, bet: int = 0):
         self.cards: List[Card] = list(args)
-        self.value: Union[IntArray, int] = 0
+        self.hard = 0
+        self.soft = 0
         self._add_values(*args)
         self.bet = bet
 
+    @property
+    def value(self) -> Union[IntArray, int]:
+        if self.soft:
+            return array([self.hard + 10, self.hard], dtype=int)
+        return self.hard
+
     def add(self, *args: Card) -> None:
         self.cards.extend(args)
         self._add_values(*args)
         return None
 
     def beat(self, hand: 'Hand') -> bool:
-        enemy_min, enemy_max = npmin(hand.value), npmax(hand.value)
-        if enemy_max <= 21:
-            return npany((21 >= self.value) & (self.value > enemy_max))
-        if enemy_min <= 21:
-            return npany((21 >= self.value) & (self.value > enemy_min))
-        return True
+        enemy_total = hand.total()
+        if enemy_total > 21:
+            return True
+        return enemy_total < self.total() <= 21
 
     def blackjack(self) -> bool:
-        return npany(self.value == 21)
+        return self.hard == 21 or (self.soft == 1 and self.hard == 11)
 
     def bust(self) -> bool:
-        return npall(self.value > 21)
+        return self.hard > 21
 
     def has_ace(self) -> bool:
-        return npany([card.ace for card in self.cards])
+        return any(card.ace for card in self.cards)
 
     def pair(self) -> bool:
         if len(self.cards) == 2:
@@ -67,7 +88,7 @@ class Hand:
         return False
 
     def recalc_value(self) -> None:
-        self.value = 0
+        self.hard, self.soft = 0, 0
         self._add_values(*self.cards)
         return None
 
@@ -82,83 +103,203 @@ class Hand:
         return top + bottom
 
     def tie_with(self, hand: 'Hand') -> bool:
-        enemy_min, enemy_max = npmin(hand.value), npmax(hand.value)
-        if enemy_max <= 21:
-            return npany(self.value == enemy_max)
-        if enemy_min <= 21:
-            return npany(self.value == enemy_min)
-        return False
+        enemy_total = hand.total()
+        if enemy_total > 21:
+            return False
+        return self.hard == enemy_total or (self.soft == 1 and self.hard + 10 == enemy_total)
+
+    def total(self) -> int:
+        """This is the highest value of the hand that does not bust, or the hard total if every value busts."""
+        if self.soft and self.hard <= 11:
+            return self.hard + 10
+        return self.hard
 
     def _add_values(self, *args: Card) -> None:
         for card in args:
-            if card.ace and isinstance(self.value, ndarray):
-                self.value += 1
-            else:
-                self.value += card.get_value()
+            if card.face_up:
+                self.hard += card.hard_value
+                if card.ace:
+                    self.soft = 1
         return None
 
 
 class Deck:
+    """
+    The cards are kept in a NumPy object array with spare capacity, so dealing only advances an index,
+    and shuffles and cuts are vectorized permutations drawn from the deck's random generator.
+    """
     ranks = {'A', 'K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2'}
     suits = {'\u2663', '\u2662', '\u2661', '\u2660'}
 
-    def __init__(self):
-        self.cards: List[Card] = []
+    def __init__(self, rng: Optional[Generator] = None):
+        self.rng = rng if rng is not None else default_rng()
         self.cards_dealt = 0
+        self._cards: CardArray = empty(0, dtype=object)
+        self._size = 0
+        self._generated: CardArray = empty(0, dtype=object)
+
+    @property
+    def cards(self) -> List[Card]:
+        """This is a copy of every card in the deck, including the cards already dealt."""
+        return self._cards[:self._size].tolist()
 
     def add(self, *args: Card) -> None:
-        self.cards = self.cards[self.cards_dealt:] + list(args)
-        self.cards_dealt = 0
+        self.add_array(fromiter(args, dtype=object, count=len(args)))
+        return None
+
+    def add_array(self, cards: CardArray) -> None:
+        """The cards already dealt are dropped, and the cards are added to the bottom of the deck."""
+        remaining = self._size - self.cards_dealt
+        if self.cards_dealt:
+            self._cards[:remaining] = self._cards[self.cards_dealt:self._size]
+        self._size, self.cards_dealt = remaining, 0
+        self._extend(cards)
+        return None
+
+    def arrange(self, codes: ndarray[Any, Any]) -> None:
+        """
+        This puts every card the deck generated in the order of the card codes, where the code of a card is its
+        index in a generated deck, and the copies of a code are taken deck by deck.
+        """
+        if len(codes) != len(self._generated):
+            raise ValueError(f'There are {len(codes)} card codes for the {len(self._generated)} generated cards.')
+        order = codes.argsort(kind='stable')
+        sorted_codes = codes[order]
+        copy = empty(len(codes), dtype=int)
+        copy[order] = arange(len(codes)) - sorted_codes.searchsorted(sorted_codes)
+        self._size, self.cards_dealt = 0, 0
+        self._extend(self._generated[copy * CARDS_PER_DECK + codes])
         return None
 
     def card_count(self) -> int:
-        return len(self.cards) - self.cards_dealt
+        return self._size - self.cards_dealt
+
+    def collect(self) -> None:
+        """This puts every card the deck generated back in the order it was generated, and drops any other card."""
+        self._size, self.cards_dealt = 0, 0
+        self._extend(self._generated)
+        return None
 
     def cut(self, ratio: float = 0.0) -> None:
-        if self.cards:
+        if self._size:
             if not 0.0 < ratio < 1.0:
-                ratio = uniform(0.0, 1.0)
-            cut_index = int((len(self.cards) - 1) * ratio)
-            self.cards = self.cards[cut_index:] + self.cards[:cut_index]
+                ratio = self.rng.uniform(0.0, 1.0)
+            cut_index = int((self._size - 1) * ratio)
+            self._cards[:self._size] = concatenate([self._cards[cut_index:self._size], self._cards[:cut_index]])
         return None
 
     def generate(self) -> None:
-        for rank in self.ranks:
-            for suit in self.suits:
-                self.cards.append(Card(rank, suit))
+        # The sets are sorted, so that a seeded shuffle gives the same shoe in every process.
+        cards = fromiter((Card(rank, suit) for rank in sorted(self.ranks) for suit in sorted(self.suits)),
+                         dtype=object, count=len(self.ranks) * len(self.suits))
+        self._generated = concatenate([self._generated, cards])
+        self._extend(cards)
         return None
 
     def get_card(self) -> Union[Card, None]:
-        if self.cards_dealt == len(self.cards):
+        if self.cards_dealt == self._size:
             return None
-        card = self.cards[self.cards_dealt]
+        card = self._cards[self.cards_dealt]
         self.cards_dealt += 1
         return card
 
     def shuffle(self) -> None:
-        """This is a modern Fisher–Yates shuffle algorithm."""
-        for i in range(len(self.cards) - 1, -1, -1):
-            j = randint(0, i)
-            self.cards[i], self.cards[j] = self.cards[j], self.cards[i]
+        self.rng.shuffle(self._cards[:self._size])
         self.cards_dealt = 0
         return None
 
+    def _extend(self, cards: CardArray) -> None:
+        size = self._size + len(cards)
+        if size > len(self._cards):
+            capacity = empty(max(size, 2 * len(self._cards)), dtype=object)
+            capacity[:self._size] = self._cards[:self._size]
+            self._cards = capacity
+        self._cards[self._size:size] = cards
+        self._size = size
+        return None
+
 
 class Tray:
+    """
+    This is a preallocated ring buffer of discarded cards, so adding a card is a single store.
+    On a reshuffle, the cards are shuffled and cut in place and handed back to the shoe as one array.
+    """
 
-    def __init__(self):
-        self.deck = Deck()
+    def __init__(self, capacity: int = 52, rng: Optional[Generator] = None):
+        self.rng = rng if rng is not None else default_rng()
+        self._cards: CardArray = empty(max(capacity, 1), dtype=object)
+        self._start = 0
+        self._count = 0
 
     def add(self, *args: Card) -> None:
-        self.deck.add(*args)
+        if self._count + len(args) > len(self._cards):
+            self._grow(self._count + len(args))
+        capacity = len(self._cards)
+        end = (self._start + self._count) % capacity
+        for card in args:
+            self._cards[end] = card
+            end = (end + 1) % capacity
+        self._count += len(args)
+        return None
+
+    def card_count(self) -> int:
+        return self._count
+
+    def cut(self, ratio: float = 0.0) -> None:
+        if self._count:
+            if not 0.0 < ratio < 1.0:
+                ratio = self.rng.uniform(0.0, 1.0)
+            cut_index = int((self._count - 1) * ratio)
+            cards = self._contents()
+            cards[:] = concatenate([cards[cut_index:], cards[:cut_index]])
         return None
 
     def empty(self) -> None:
-        self.deck = Deck()
+        self._start, self._count = 0, 0
         return None
 
-    def card_count(self) -> int:
-        return self.deck.card_count()
+    def shuffle(self) -> None:
+        self.rng.shuffle(self._contents())
+        return None
+
+    def take(self) -> CardArray:
+        """This empties the tray and returns its cards as a view that is valid until the next card is added."""
+        cards = self._contents()
+        self.empty()
+        return cards
+
+    def _contents(self) -> CardArray:
+        """This moves the cards to the front of the buffer, if they wrap around, and returns them in order."""
+        end = self._start + self._count
+        if end > len(self._cards):
+            self._cards[:self._count] = concatenate([self._cards[self._start:], self._cards[:end - len(self._cards)]])
+            self._start = 0
+        return self._cards[self._start:self._start + self._count]
+
+    def _grow(self, size: int) -> None:
+        cards = self._contents().copy()
+        self._cards = empty(max(size, 2 * len(self._cards)), dtype=object)
+        self._cards[:self._count] = cards
+        self._start = 0
+        return None
+
+
+class ShoeRng:
+    """
+    This is a random generator that is reseeded from a seed and the number of the shoe before every shuffle,
+    so any shoe can be shuffled again without shuffling the shoes before it. The generator is reseeded in place,
+    since the deck and the tray share it.
+    """
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.shoe = 0
+        self.generator = Generator(PCG64(SeedSequence(seed, spawn_key=(0,))))
+
+    def jump(self, shoe: int) -> None:
+        self.shoe = shoe
+        self.generator.bit_generator.state = PCG64(SeedSequence(self.seed, spawn_key=(shoe,))).state
+        return None
 
 
 class Shoe:
@@ -173,6 +314,10 @@ class Shoe:
         self.deck.add(*args)
         return None
 
+    def add_array(self, cards: CardArray) -> None:
+        self.deck.add_array(cards)
+        return None
+
     def get_card(self) -> Card:
         return self.deck.get_card()
 
@@ -191,6 +336,7 @@ class Player:
         self.choices = {'h': self.hit, 's': self.stand, 'd': self.double,
                         'y': self.split, 'sur': self.surrender}
         self.sleep_int = 1
+        self.headless = False
         self._your_turn = False
 
     def ask_for_insurance(self) -> None:
@@ -272,12 +418,17 @@ class Player:
         return None
 
     def show_hand(self, *args: Hand) -> None:
+        if self.headless:
+            return None
         for hand in args:
             print(f"{self.name}: {hand.show(f'{self.name}: ')}; Value: {hand.value}")
             sleep(self.sleep_int)
         return None
 
     def show_score(self, hand: Hand, result: str, blackjack: bool = False) -> None:
+        if self.headless:
+            return None
+
         def if_result(s: str) -> int:
             return int(result == s)
         title = 'Winner' * if_result('won') + 'Loser' * if_result('lost') + 'Standoff' * if_result('tied')
@@ -317,13 +468,14 @@ class Player:
 
     def use_insurance(self, hand: Hand) -> None:
         self.chips += self.insurance + hand.bet
-        print(f"{self.name} insured hand {hand.show(f'{self.name} insured hand ')} for {self.insurance} chips.")
-        print(f'You receive {hand.bet} chips insured with {self.insurance} chips insurance.')
+        if not self.headless:
+            print(f"{self.name} insured hand {hand.show(f'{self.name} insured hand ')} for {self.insurance} chips.")
+            print(f'You receive {hand.bet} chips insured with {self.insurance} chips insurance.')
+            sleep(self.sleep_int)
         if hand in self.hands:
             self.hands.remove(hand)
         self.insurance = 0
         self._your_turn = False
-        sleep(self.sleep_int)
         return None
 
     def won(self, hand: Hand) -> None:
@@ -349,57 +501,184 @@ class Player:
         return False
 
 
+class CountTracker:
+    """
+    This keeps the running count of several card counting systems at once, updated card by card,
+    so that running and true counts are read in constant time.
+    The true count divides by the decks left in the shoe, rounded to the nearest quarter deck by default.
+    """
+    # The keys are the maximum values of the cards, so an ace is 11.
+    systems = {
+        'hi-lo': {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 11: -1},
+        'ko': {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 1, 8: 0, 9: 0, 10: -1, 11: -1},
+        'hi-opt ii': {2: 1, 3: 1, 4: 2, 5: 2, 6: 1, 7: 1, 8: 0, 9: 0, 10: -2, 11: 0},
+        'omega ii': {2: 1, 3: 1, 4: 2, 5: 2, 6: 2, 7: 1, 8: 0, 9: -1, 10: -2, 11: 0}
+    }
+
+    def __init__(self, cards: int, systems: Optional[Dict[str, Dict[int, int]]] = None,
+                 round_to_nearest_deck: float = 0.25):
+        self.round_to_nearest_deck = round_to_nearest_deck
+        self.tables: Dict[str, Dict[int, int]] = {}
+        self.index: Dict[str, int] = {}
+        self.running: List[int] = []
+        self.seen: List[int] = [0] * 12  # This is the number of counted cards of each maximum value.
+        self.cards_remaining = cards
+        self._increments: List[Tuple[int, ...]] = [()] * 12
+        self._decks_remaining = 0.0
+        self._decks_remaining_of = -1
+        for name, table in {**self.systems, **(systems or {})}.items():
+            self.add_system(name, table)
+
+    def add_system(self, name: str, table: Dict[int, int]) -> None:
+        """A system added during a shoe starts from the running count of the cards already counted."""
+        self.tables[name] = table
+        self.index[name] = len(self.running)
+        self.running.append(sum(table.get(value, 0) * seen for value, seen in enumerate(self.seen)))
+        self._increments = [tuple(table.get(value, 0) for table in self.tables.values()) for value in range(12)]
+        return None
+
+    def count(self, card: Card) -> None:
+        self.seen[card.max_value] += 1
+        self.running = list(map(add, self.running, self._increments[card.max_value]))
+        return None
+
+    def deal(self) -> None:
+        self.cards_remaining -= 1
+        return None
+
+    def decks_remaining(self) -> float:
+        if self._decks_remaining_of != self.cards_remaining:
+            decks_remaining = self.cards_remaining / 52
+            if self.round_to_nearest_deck:
+                decks_remaining = round(decks_remaining / self.round_to_nearest_deck) * self.round_to_nearest_deck
+            self._decks_remaining = max(decks_remaining, self.round_to_nearest_deck or 1 / 52)
+            self._decks_remaining_of = self.cards_remaining
+        return self._decks_remaining
+
+    def reset(self, cards: int) -> None:
+        self.running = [0] * len(self.running)
+        self.seen = [0] * 12
+        self.cards_remaining = cards
+        return None
+
+    def running_count(self, system: str = 'hi-lo') -> int:
+        return self.running[self.index[system]]
+
+    def running_counts(self) -> Dict[str, int]:
+        return dict(zip(self.index, self.running))
+
+    def true_count(self, system: str = 'hi-lo') -> float:
+        return self.running[self.index[system]] / self.decks_remaining()
+
+    def true_counts(self) -> Dict[str, float]:
+        decks_remaining = self.decks_remaining()
+        return {name: running / decks_remaining for name, running in zip(self.index, self.running)}
+
+
+class TableStats:
+    """
+    These are the seconds spent in each phase of the rounds and counters of what happened in them,
+    which the Table and the Dealer collect while the stats of the Table are set. They are None by default,
+    which costs one check per phase. The reshuffle is timed between rounds, before the bets.
+    """
+    phases = ['reshuffle', 'deal', 'insurance', 'decisions', 'dealer', 'settlement']
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = dict.fromkeys(self.phases, 0.0)
+        self.rounds = 0
+        self.cards_dealt = 0
+        self.splits = 0
+        self.doubles = 0
+        self.reshuffles = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'seconds': dict(self.seconds), 'rounds': self.rounds, 'cards_dealt': self.cards_dealt,
+                'splits': self.splits, 'doubles': self.doubles, 'reshuffles': self.reshuffles}
+
+    def show(self) -> str:
+        total = sum(self.seconds.values()) or 1.0
+        rounds = self.rounds or 1
+        lines = [f'{phase:<12}{seconds:>10.3f} s {seconds / total:>7.1%} {1e6 * seconds / rounds:>9.2f} us/round'
+                 for phase, seconds in self.seconds.items()]
+        lines.append(f'Rounds: {self.rounds}; Cards dealt: {self.cards_dealt}; Splits: {self.splits}; '
+                     f'Doubles: {self.doubles}; Reshuffles: {self.reshuffles}')
+        return '\n'.join(lines)
+
+
 class Dealer:
     # Hi-Lo Card Counting System
-    count_map = {0: 0, 2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 11: -1}
+    count_map = {0: 0, **CountTracker.systems['hi-lo']}
 
     def __init__(self, shoe: Shoe, tray: Tray):
         self.hand = Hand()
         self.shoe = shoe
         self.tray = tray
-        self.running_count = 0
+        self.counter = CountTracker(shoe.deck.card_count())
         self.players_hands: Dict[int, List[Hand]] = {}
         self.choices = {'h': self.hit, 's': self.void, 'd': self.double,
                         'y': self.split, 'sur': self.surrender}
         self.sleep_int = 1
+        self.headless = False
+        self.stats: Optional[TableStats] = None
+        self.shoe_rng: Optional[ShoeRng] = None
+        self.corpus: Optional[ShoeCorpus] = None
+        self.shoe_number = 0
+        self.calls: Optional[Dict[Hand, List[str]]] = None  # These are the decisions on each hand, when logged.
+
+    @property
+    def running_count(self) -> int:
+        return self.counter.running_count()
 
     def add_to_running_count(self, card: Card) -> None:
-        self.running_count += self.count_map[npmax(card.get_value())]
+        if card.face_up:
+            self.counter.count(card)
         return None
 
     def hand_below_seventeen(self) -> bool:
-        val = self.hand.value
-        return npany(val < 17) and not npany((17 <= val) & (val <= 21))
+        return self.hand.total() < 17
 
     def call_on(self, player: Player, hand: Hand) -> None:
         player.dealer_ref = self  # This is for robot players to use.
         player.show_hand(hand)
         choice = player.call(hand)
+        if self.calls is not None:
+            self.calls.setdefault(hand, []).append(choice)
         self.choices[choice](player, hand)
         return None
 
     def deal_card(self, *args: Hand, face_up=True) -> None:
+        if self.stats is not None:
+            self.stats.cards_dealt += len(args)
         for hand in args:
             card = self.shoe.get_card()
+            self.counter.deal()
             card.face_up = face_up
             hand.add(card)
             self.add_to_running_count(card)
         return None
 
-    def deal_all(self, players: List[Player]) -> None:
+    def burn(self, cards: int) -> None:
+        """This deals a number of cards face up straight to the tray, so they are counted but never played."""
+        for _ in range(cards):
+            card = self.shoe.get_card()
+            self.counter.deal()
+            card.face_up = True
+            self.add_to_running_count(card)
+            self.tray.add(card)
+        return None
+
+    def check_cut_card(self) -> None:
+        """Once the cut card is out, the shoe is reshuffled before the next bets, so a round is bet on its own shoe."""
         if self.tray.card_count() >= self.shoe.cut_off:
-            self.running_count = 0
-            self.tray.deck.shuffle()
-            #ratio = float(input('Deck cut ratio: '))
-            ratio = 0.5
-            self.tray.deck.cut(ratio)
-            self.shoe.add(*self.tray.deck.cards)
-            self.tray.empty()
-            burner_card = self.shoe.get_card()
-            burner_card.face_up = True
-            print(Hand(burner_card).show())
-            self.add_to_running_count(burner_card)
-            self.tray.add(burner_card)
+            start = perf_counter() if self.stats is not None else 0.0
+            self.reshuffle()
+            if self.stats is not None:
+                self.stats.reshuffles += 1
+                self.stats.cards_dealt += 1
+                self.stats.seconds['reshuffle'] += perf_counter() - start
+        return None
+
+    def deal_all(self, players: List[Player]) -> None:
         for player in players:
             self.deal_card(player.hands[0])
         self.deal_card(self.hand, face_up=False)
@@ -414,6 +693,8 @@ class Dealer:
         return None
 
     def double(self, player: Player, hand: Hand) -> None:
+        if self.stats is not None:
+            self.stats.doubles += 1
         self.deal_card(hand)
         player.show_hand(hand)
         return None
@@ -426,11 +707,8 @@ class Dealer:
     def face_up_card(self) -> Card:
         return self.hand.cards[1]
 
-    def get_true_count(self) -> float:
-        round_to_nearest_deck = 0.25
-        decks_remaining = len(self.shoe.deck.cards) / 52
-        decks_remaining = round(decks_remaining / round_to_nearest_deck) * round_to_nearest_deck
-        return self.running_count / decks_remaining
+    def get_true_count(self, system: str = 'hi-lo') -> float:
+        return self.counter.true_count(system)
 
     def hit(self, player: Player, hand: Hand) -> None:
         self.deal_card(hand)
@@ -441,12 +719,57 @@ class Dealer:
         self.hand.recalc_value()
         return None
 
+    def reshuffle(self, shoe: Optional[int] = None) -> None:
+        """
+        Without a shoe random generator, the tray is shuffled, cut and put under the cards left in the shoe.
+        With one, every card is collected in the order it was generated and shuffled from the seed and the number
+        of the shoe, so the shoe depends on nothing before it. With a corpus, the cards are put in the order of
+        the shoe with the number in the corpus, which is already shuffled and is not cut.
+        The first card is burned, except in the first shoe.
+        """
+        shoe = self.shoe_number + 1 if shoe is None else shoe
+        if self.corpus is not None and not 0 <= shoe < len(self.corpus):
+            # This is raised before the shoe changes, so the table is left between rounds at the last shoe.
+            raise ValueError(f'The corpus {self.corpus.path} has {len(self.corpus)} shoes, so there is no shoe '
+                             f'{shoe} to deal. A larger corpus can be written with shoe_corpus.py.')
+        self.shoe_number = shoe
+        #ratio = float(input('Deck cut ratio: '))
+        ratio = 0.5
+        if self.corpus is not None:
+            self.tray.empty()
+            self.shoe.deck.arrange(self.corpus[self.shoe_number])
+        elif self.shoe_rng is None:
+            self.tray.shuffle()
+            self.tray.cut(ratio)
+            self.shoe.add_array(self.tray.take())
+        else:
+            self.tray.empty()
+            self.shoe.deck.collect()
+            self.shoe_rng.jump(self.shoe_number)
+            self.shoe.deck.shuffle()
+            self.shoe.deck.cut(ratio)
+        self.counter.reset(self.shoe.deck.card_count())
+        if not self.shoe_number:
+            return None
+        burner_card = self.shoe.get_card()
+        self.counter.deal()
+        burner_card.face_up = True
+        if not self.headless:
+            print(Hand(burner_card).show())
+        self.add_to_running_count(burner_card)
+        self.tray.add(burner_card)
+        return None
+
     def show_hand(self) -> None:
+        if self.headless:
+            return None
         print(f"Dealer 0: {self.hand.show(f'Dealer 0: ')}; Value: {self.hand.value}")
         sleep(self.sleep_int)
         return None
 
     def split(self, player: Player, hand: Hand) -> None:
+        if self.stats is not None:
+            self.stats.splits += 1
         card1, card2 = hand.cards
         player.hands.remove(hand)
         split_hands = [Hand(card1, bet=hand.bet), Hand(card2, bet=hand.bet)]
@@ -457,10 +780,11 @@ class Dealer:
         return None
 
     def surrender(self, player: Player, hand: Hand) -> None:
-        print(f'{player.name} surrendered hand.\n'
-              f'You reclaim {hand.bet // 2} chips.')
+        if not self.headless:
+            print(f'{player.name} surrendered hand.\n'
+                  f'You reclaim {hand.bet // 2} chips.')
+            sleep(self.sleep_int)
         self.discard(hand)
-        sleep(self.sleep_int)
         return None
 
     @staticmethod
@@ -468,91 +792,240 @@ class Dealer:
         pass
 
 
+class RoundOutcome(NamedTuple):
+    round_number: int
+    seat: int
+    name: str
+    bet: int
+    net: int
+    true_count: float
+    shoe: int = 0
+
+
 class Table:
 
-    def __init__(self, players: int, decks: int, minimum_bet: int, penetration: float):
-        deck = Deck()
+    def __init__(self, players: int, decks: int, minimum_bet: int, penetration: float,
+                 rng: Optional[Generator] = None, seed: Optional[int] = None, corpus: Optional[ShoeCorpus] = None):
+        """
+        Every shuffle and cut at the table draws from the random generator, which can be seeded.
+        Given a seed instead, every shoe is shuffled from the seed and the number of the shoe alone,
+        so a round can be played again from the seed and the shoe of its outcome with the jump method.
+        Given a corpus, shoe n is the nth shoe of the corpus, and nothing is shuffled.
+        """
+        if (rng is not None) + (seed is not None) + (corpus is not None) > 1:
+            raise ValueError('Only one of the arguments "rng", "seed" and "corpus" can be given.')
+        if corpus is not None and corpus.decks != decks:
+            raise ValueError(f'The corpus has shoes of {corpus.decks} decks, not {decks}.')
+        self.shoe_rng = ShoeRng(seed) if seed is not None else None
+        self.corpus = corpus
+        deck = Deck(self.shoe_rng.generator if self.shoe_rng is not None else rng)
         for _ in range(decks):
             deck.generate()
         deck.shuffle()
-        shoe, tray = Shoe(deck, penetration), Tray()
+        shoe, tray = Shoe(deck, penetration), Tray(deck.card_count(), deck.rng)
         self.dealer = Dealer(shoe, tray)
+        self.dealer.shoe_rng, self.dealer.corpus = self.shoe_rng, self.corpus
+        if self.shoe_rng is not None or self.corpus is not None:
+            self.dealer.reshuffle(0)
         self.players = [Player(i) for i in range(1, players + 1)]
         self.minimum_bet = minimum_bet
         self.sleep_int = 1
+        self.headless = False
+        self.outcomes: Optional[List[RoundOutcome]] = None
+        self.stats: Optional[TableStats] = None
+        self.log: Optional[RoundLog] = None
+        self._insured: Dict[int, bool] = {}
+        self._played: Dict[int, List[Hand]] = {}
 
     def play(self, condition: Callable[[], bool] = lambda: True) -> None:
         self.dealer.sleep_int = self.sleep_int
+        self.dealer.headless = self.headless
+        self.dealer.stats = self.stats
+        self.dealer.calls = {} if self.log is not None else None
         for player in self.players:
+            player.dealer_ref = self.dealer  # This is for robot players to use.
             player.rounds = 0
             player.sleep_int = self.sleep_int
+            player.headless = self.headless
         while condition():
-            sleep(self.sleep_int)
+            if not self.headless:
+                sleep(self.sleep_int)
             self.dealer.discard(self.dealer.hand)
             self.dealer.hand = Hand()
+            self.dealer.check_cut_card()
+            chips = [player.chips for player in self.players]
+            true_count, shoe = self.dealer.get_true_count(), self.dealer.shoe_number
+            if self.log is not None:
+                running_count, self.dealer.calls = self.dealer.running_count, {}
             current_players = []
             for player in self.players:
                 if player.place_bet(self.minimum_bet):
                     current_players.append(player)
             if not current_players:
                 return None
-            self.dealer.deal_all(current_players)
-            self.dealer.show_hand()
-            for player in current_players:
-                for hand in player.hands:
-                    player.show_hand(hand)
-            if self.dealer.face_up_card().ace:
-                for player in current_players:
-                    player.ask_for_insurance()
-            self.dealer.peek_at_hole_card()
-            if self.dealer.hand.blackjack():
-                self.dealer.face_hole_card()
-                for player in current_players:
-                    for hand in player.hands:
-                        if player.insurance:
-                            if hand.blackjack():
-                                player.push(hand)
-                            player.use_insurance(hand)
-                        elif hand.blackjack():
-                            player.push(hand)
-                        else:
-                            player.lost(hand)
-                        self.dealer.discard(hand)
-                continue
+            self._play_round(current_players)
+            if self.stats is not None:
+                self.stats.rounds += 1
+            if self.outcomes is not None:
+                for seat, player in enumerate(self.players):
+                    if player in current_players:
+                        self.outcomes.append(RoundOutcome(player.rounds, seat, player.name, player.total_bet,
+                                                          player.chips - chips[seat], true_count, shoe))
+            if self.log is not None:
+                self._log_round(current_players, chips, running_count, true_count, shoe)
+        return None
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        This is where a table created with a seed or a corpus is between rounds: the seed or the path of the
+        corpus, the shoe and the cards dealt from it.
+        """
+        return {**self._source(), 'shoe': self.dealer.shoe_number, 'cards_dealt': self.dealer.shoe.deck.cards_dealt}
+
+    def jump(self, shoe: int) -> None:
+        """This starts the shoe with the number over, without dealing the shoes before it."""
+        self._source()
+        self.dealer.discard(self.dealer.hand)
+        self.dealer.hand = Hand()
+        headless, self.dealer.headless = self.dealer.headless, True
+        try:
+            self.dealer.reshuffle(shoe)
+        finally:
+            self.dealer.headless = headless
+        return None
+
+    def restore(self, checkpoint: Dict[str, Any]) -> None:
+        """This jumps to the shoe of a checkpoint and discards the cards dealt from it, counting them."""
+        if any(checkpoint.get(key) != value for key, value in self._source().items()):
+            raise ValueError('A checkpoint can only be restored to a table created with the same seed or corpus.')
+        self.jump(checkpoint['shoe'])
+        self.dealer.burn(checkpoint['cards_dealt'] - self.dealer.shoe.deck.cards_dealt)
+        return None
+
+    def simulate(self, condition: Callable[[], bool] = lambda: True) -> List[RoundOutcome]:
+        """
+        This plays the same rounds as the play method without printing, sleeping or asking for input,
+        so every seat must be taken by a robot. One outcome is returned per seat per round,
+        where the net is the change in chips over the round and the true count is taken before betting.
+        """
+        headless, self.headless = self.headless, True
+        self.outcomes = []
+        try:
+            self.play(condition)
+            return self.outcomes
+        finally:
+            self.headless = headless
+            self.outcomes = None
+
+    def _play_round(self, current_players: List[Player]) -> None:
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        self.dealer.deal_all(current_players)
+        self.dealer.show_hand()
+        for player in current_players:
+            for hand in player.hands:
+                player.show_hand(hand)
+        if stats is not None:
+            start = self._time('deal', start)
+        if self.log is not None:
+            # Robots share a player number, so the log keeps the hands of every seat by the player itself.
+            self._played = {id(player): player.hands.copy() for player in current_players}
+        if self.dealer.face_up_card().ace:
             for player in current_players:
-                self.dealer.players_hands[player.n] = player.hands.copy()
-                dealers_list_ref = self.dealer.players_hands[player.n]
-                for hand in dealers_list_ref:
-                    if hand.blackjack():
-                        player.won_blackjack(hand)
-                        self.dealer.discard(hand)
-                    while player.your_turn():
-                        self.dealer.call_on(player, hand)
-                        if hand.bust():
-                            player.bust(hand)
-                            self.dealer.discard(hand)
+                player.ask_for_insurance()
+            if self.log is not None:
+                self._insured = {id(player): player.insurance > 0 for player in current_players}
+        self.dealer.peek_at_hole_card()
+        if stats is not None:
+            start = self._time('insurance', start)
+        if self.dealer.hand.blackjack():
             self.dealer.face_hole_card()
-            if not any(player.hands for player in current_players):
-                continue
-            while self.dealer.hand_below_seventeen():
-                self.dealer.deal_card(self.dealer.hand)
-                self.dealer.show_hand()
-            if self.dealer.hand.bust():
-                for player in current_players:
-                    for hand in player.hands.copy():
-                        player.won(hand)
-                        self.dealer.discard(hand)
             for player in current_players:
-                for hand in player.hands.copy():
-                    if hand.beat(self.dealer.hand):
-                        player.won(hand)
-                    elif hand.tie_with(self.dealer.hand):
+                for hand in player.hands:
+                    if player.insurance:
+                        if hand.blackjack():
+                            player.push(hand)
+                        player.use_insurance(hand)
+                    elif hand.blackjack():
                         player.push(hand)
                     else:
                         player.lost(hand)
                     self.dealer.discard(hand)
+            if stats is not None:
+                self._time('settlement', start)
+            return None
+        for player in current_players:
+            self.dealer.players_hands[player.n] = player.hands.copy()
+            dealers_list_ref = self.dealer.players_hands[player.n]
+            if self.log is not None:
+                self._played[id(player)] = dealers_list_ref
+            for hand in dealers_list_ref:
+                if hand.blackjack():
+                    player.won_blackjack(hand)
+                    self.dealer.discard(hand)
+                while player.your_turn():
+                    self.dealer.call_on(player, hand)
+                    if hand.bust():
+                        player.bust(hand)
+                        self.dealer.discard(hand)
+        if stats is not None:
+            start = self._time('decisions', start)
+        self.dealer.face_hole_card()
+        if not any(player.hands for player in current_players):
+            if stats is not None:
+                self._time('dealer', start)
+            return None
+        while self.dealer.hand_below_seventeen():
+            self.dealer.deal_card(self.dealer.hand)
+            self.dealer.show_hand()
+        if stats is not None:
+            start = self._time('dealer', start)
+        if self.dealer.hand.bust():
+            for player in current_players:
+                for hand in player.hands.copy():
+                    player.won(hand)
+                    self.dealer.discard(hand)
+        for player in current_players:
+            for hand in player.hands.copy():
+                if hand.beat(self.dealer.hand):
+                    player.won(hand)
+                elif hand.tie_with(self.dealer.hand):
+                    player.push(hand)
+                else:
+                    player.lost(hand)
+                self.dealer.discard(hand)
+        if stats is not None:
+            self._time('settlement', start)
         return None
 
+    def _log_round(self, current_players: List[Player], chips: List[int], running_count: int,
+                   true_count: float, shoe: int) -> None:
+        calls = self.dealer.calls
+        for seat, player in enumerate(self.players):
+            if player in current_players:
+                # A hand that was split is not finished, since its cards were dealt to the hands it made.
+                hands = [hand for hand in self._played[id(player)] if calls.get(hand, [''])[-1] != 'y']
+                self.log.record(player.rounds, shoe, seat, player.total_bet, player.chips - chips[seat],
+                                self._insured.get(id(player), False), running_count, true_count,
+                                self.dealer.hand.cards, hands, calls)
+        self._insured, self._played = {}, {}
+        return None
+
+    def _source(self) -> Dict[str, Any]:
+        """This is what the shoes of the table are made from, which only a seed or a corpus can make again."""
+        if self.shoe_rng is not None:
+            return {'seed': self.shoe_rng.seed}
+        if self.corpus is not None:
+            return {'corpus': self.corpus.path}
+        raise ValueError('Only a table created with a seed or a corpus can go back to a shoe.')
+
+    def _time(self, phase: str, start: float) -> float:
+        """This adds the time since the start to the phase and returns the time, which starts the next phase."""
+        now = perf_counter()
+        self.stats.seconds[phase] += now - start
+        return now
+
 
 if __name__ == '__main__':
     table = Table(players=2, decks=6, minimum_bet=50, penetration=0.75)
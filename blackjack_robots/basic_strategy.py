@@ -1,10 +1,70 @@
 from time import sleep
+from typing import Any, Dict, List, Optional, Tuple
 
-from numpy import max as npmax, min as npmin
+from numpy import full, int8, isnan, nan, ndarray, where
 
 from blackjack import Card, Hand, Player, Table
 
 
+# (Pair, Ace, Total, Upcard): (True Count Threshold, Choice At Or Above Threshold, Choice Below Threshold)
+Deviations = Dict[Tuple[bool, bool, int, int], Tuple[float, str, str]]
+
+
+class StrategyTable:
+    """
+    This is a decision tree compiled into flat arrays indexed by (pair, soft, total, upcard).
+    Count deviations are stored as a threshold array that is compared against the true count.
+    """
+    choices = ['h', 's', 'd', 'y', 'sur', 'ds']
+    codes = {choice: code for code, choice in enumerate(choices)}
+
+    def __init__(self, decision_tree: Dict, deviations: Optional[Deviations] = None):
+        shape = (2, 2, 22, 12)
+        self.table: ndarray[Any, int] = full(shape, -1, dtype=int8)
+        self.threshold: ndarray[Any, float] = full(shape, nan)
+        self.at_or_above: ndarray[Any, int] = full(shape, -1, dtype=int8)
+        self.below: ndarray[Any, int] = full(shape, -1, dtype=int8)
+        for pair, ace_tree in decision_tree['pair'].items():
+            for ace, total_tree in ace_tree['ace'].items():
+                for total, upcard_tree in total_tree['total'].items():
+                    for upcard, choice in upcard_tree['upcard'].items():
+                        self.table[int(pair), int(ace), total, upcard] = self.codes[choice]
+        # These flat lists serve single decisions, where indexing a list is cheaper than indexing an array.
+        self._choice: List[Optional[str]] = [self.choices[code] if code >= 0 else None
+                                             for code in self.table.ravel().tolist()]
+        self._deviation: List[Optional[Tuple[float, str, str]]] = [None] * self.table.size
+        self.deviations = deviations or {}
+        for (pair, ace, total, upcard), (threshold, at_or_above, below) in self.deviations.items():
+            index = (int(pair), int(ace), total, upcard)
+            self.threshold[index] = threshold
+            self.at_or_above[index] = self.codes[at_or_above]
+            self.below[index] = self.codes[below]
+            self._deviation[((2 * pair + ace) * 22 + total) * 12 + upcard] = (threshold, at_or_above, below)
+
+    def decide(self, pair: ndarray, soft: ndarray, total: ndarray, upcard: ndarray,
+               true_count: Optional[ndarray] = None) -> ndarray[Any, int]:
+        """This returns the choice codes for arrays of hands, where pair and soft are zeros and ones."""
+        codes = self.table[pair, soft, total, upcard]
+        if self.deviations and true_count is not None:
+            threshold = self.threshold[pair, soft, total, upcard]
+            deviation = where(true_count >= threshold,
+                              self.at_or_above[pair, soft, total, upcard], self.below[pair, soft, total, upcard])
+            codes = where(isnan(threshold), codes, deviation)
+        return codes
+
+    def lookup(self, pair: bool, soft: bool, total: int, upcard: int, true_count: float = 0.0) -> str:
+        """This returns the choice for a single hand."""
+        i = ((2 * pair + soft) * 22 + total) * 12 + upcard
+        deviation = self._deviation[i]
+        if deviation is None:
+            choice = self._choice[i]
+            if choice is None:
+                raise KeyError(f'There is no choice for pair {pair}, soft {soft}, total {total} and upcard {upcard}.')
+            return choice
+        threshold, at_or_above, below = deviation
+        return at_or_above if true_count >= threshold else below
+
+
 class BasicStrategy(Player):
     decision_tree = {
         'pair': {
@@ -106,6 +166,7 @@ class BasicStrategy(Player):
             }
         }
     }
+    strategy_table = StrategyTable(decision_tree)
 
     def __init__(self):
         super().__init__(0)
@@ -125,15 +186,9 @@ class BasicStrategy(Player):
         return self.choices[choice](hand)
 
     def decision(self, hand: Hand, up_card: Card) -> str:
-        min_, max_ = npmin(hand.value), npmax(hand.value)
-        if max_ > 21:
-            total = min_
-        else:
-            total = max_
-        # Soft strategy is applicable when the minimum hand value is greater than 9.
-        has_ace = hand.has_ace() and npmin(hand.value) > 9
-        return self.decision_tree['pair'][hand.pair()]['ace'][has_ace]\
-            ['total'][total]['upcard'][npmax(up_card.get_value())]
+        total = hand.total()
+        # Soft strategy is applicable when the ace can still count as eleven.
+        return self.strategy_table.lookup(hand.pair(), total != hand.hard, total, up_card.max_value)
 
     def double(self, hand: Hand) -> str:
         if len(hand.cards) == 2:
@@ -148,8 +203,9 @@ class BasicStrategy(Player):
 
     def place_bet(self, minimum_bet: int) -> bool:
         if self.chips >= minimum_bet:
-            print(f'{self.name}; Chips: {self.chips}; Place bet: {minimum_bet}')
-            sleep(self.sleep_int)
+            if not self.headless:
+                print(f'{self.name}; Chips: {self.chips}; Place bet: {minimum_bet}')
+                sleep(self.sleep_int)
             self.total_bet = minimum_bet
             self.hands.append(Hand(bet=minimum_bet))
             self.chips -= minimum_bet
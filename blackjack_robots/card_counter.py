@@ -1,19 +1,82 @@
+import json
+from math import floor
 from time import sleep
-from typing import Callable
+from typing import Any, Dict, Optional
 
-from blackjack_robots.basic_strategy import BasicStrategy
-from blackjack import Hand, Player, Table
+from numpy import array, clip, int64, ndarray
+from numpy import floor as floor_array
+
+from blackjack_robots.basic_strategy import BasicStrategy, Deviations, StrategyTable
+from blackjack import Card, Hand, Player, Table
+
+
+class BetSchedule:
+    """
+    These are the bets, in units of the minimum bet, for every floored true count from the lowest to the highest,
+    and a true count outside of them is bet as the nearest one.
+    """
+
+    def __init__(self, units: Dict[int, float]):
+        self.low, self.high = min(units), max(units)
+        if sorted(units) != list(range(self.low, self.high + 1)):
+            raise ValueError('The true counts of a bet schedule must be consecutive integers.')
+        if min(units.values()) < 1.0:
+            raise ValueError('No bet of a bet schedule can be less than the minimum bet.')
+        self.units = array([units[true_count] for true_count in range(self.low, self.high + 1)], dtype=float)
+
+    def as_dict(self) -> Dict[int, float]:
+        return {self.low + i: float(units) for i, units in enumerate(self.units)}
+
+    def bet(self, true_count: float, minimum_bet: int) -> int:
+        return int(minimum_bet * self.units[min(max(floor(true_count), self.low), self.high) - self.low])
+
+    def bets(self, true_count: ndarray[Any, float], minimum_bet: int) -> ndarray[Any, int64]:
+        index = clip(floor_array(true_count), self.low, self.high).astype(int64) - self.low
+        return (minimum_bet * self.units[index]).astype(int64)
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump({str(true_count): units for true_count, units in self.as_dict().items()}, file, indent=1)
+        return None
+
+    @staticmethod
+    def load(path: str) -> 'BetSchedule':
+        with open(path) as file:
+            return BetSchedule({int(true_count): units for true_count, units in json.load(file).items()})
 
 
 class CardCounter(BasicStrategy):
+    # The deviations and the bet ramp are indexed for this counting system.
+    count_system = 'hi-lo'
+    deviations: Deviations = {
+        (False, False, 16, 9): (5, 's', 'h'),
+        (False, False, 16, 10): (0, 's', 'h'),
+        (False, False, 15, 10): (4, 's', 'h'),
+        (False, False, 13, 2): (-1, 's', 'h'),
+        (False, False, 13, 3): (-2, 's', 'h'),
+        (False, False, 12, 2): (4, 's', 'h'),
+        (False, False, 12, 3): (2, 's', 'h'),
+        (False, False, 12, 4): (0, 's', 's'),
+        (False, False, 12, 5): (-1, 's', 'h'),
+        (False, False, 12, 6): (-1, 's', 'h'),
+        (False, False, 11, 11): (-1, 'd', 'd'),
+        (False, False, 10, 10): (4, 'd', 'h'),
+        (False, False, 10, 11): (4, 'd', 'h'),
+        (False, False, 9, 2): (1, 'd', 'h'),
+        (False, False, 9, 7): (4, 'd', 'h'),
+        (True, False, 20, 5): (5, 'y', 's'),
+        (True, False, 20, 6): (5, 'y', 's')
+    }
+    strategy_table = StrategyTable(BasicStrategy.decision_tree, deviations)
+    # Without a bet schedule, the bet ramps up by the minimum bet for every true count above zero.
+    bet_schedule: Optional[BetSchedule] = None
 
     def __init__(self):
         super().__init__()
         self.name = 'Card Counter'
-        self._apply_deviations()
 
     def ask_for_insurance(self) -> None:
-        if self.dealer_ref and self.dealer_ref.get_true_count() >= 3:
+        if self.dealer_ref and self.dealer_ref.get_true_count(self.count_system) >= 3:
             price = self.total_bet // 2
             if self.chips >= price:
                 self.chips -= price
@@ -23,30 +86,30 @@ class CardCounter(BasicStrategy):
         self.insurance = 0
         return None
 
-    def call(self, hand: Hand) -> str:
-        up_card = self.dealer_ref.hand.cards[1]
-        choice = self.decision(hand, up_card)
-        if isinstance(choice, Callable):
-            choice = choice()
-        if choice == 'ds':
-            if len(hand.cards) == 2:
-                choice = 'd'
-            else:
-                choice = 's'
-        return self.choices[choice](hand)
+    def load_bet_schedule(self, path: str) -> None:
+        self.bet_schedule = BetSchedule.load(path)
+        return None
+
+    def decision(self, hand: Hand, up_card: Card) -> str:
+        total = hand.total()
+        return self.strategy_table.lookup(hand.pair(), total != hand.hard, total, up_card.max_value,
+                                          self.dealer_ref.get_true_count(self.count_system))
 
     def place_bet(self, minimum_bet: int) -> bool:
         if self.dealer_ref:
-            true_count = self.dealer_ref.get_true_count()
+            true_count = self.dealer_ref.get_true_count(self.count_system)
         else:
             true_count = 0.0
-        if true_count <= 0.0:
+        if self.bet_schedule is not None:
+            bet = self.bet_schedule.bet(true_count, minimum_bet)
+        elif true_count <= 0.0:
             bet = minimum_bet
         else:
             bet = int(minimum_bet + minimum_bet * true_count)
         if bet <= self.chips:
-            print(f'{self.name}; Chips: {self.chips}; Place bet: {bet}')
-            sleep(self.sleep_int)
+            if not self.headless:
+                print(f'{self.name}; Chips: {self.chips}; Place bet: {bet}')
+                sleep(self.sleep_int)
             self.total_bet = bet
             self.hands.append(Hand(bet=bet))
             self.chips -= bet
@@ -56,8 +119,10 @@ class CardCounter(BasicStrategy):
         return False
 
     def show_hand(self, *args: Hand) -> None:
+        if self.headless:
+            return None
         if self.dealer_ref:
-            true_count = f'; Count: {self.dealer_ref.get_true_count()}'
+            true_count = f'; Count: {self.dealer_ref.get_true_count(self.count_system)}'
         else:
             true_count = ''
         for hand in args:
@@ -65,43 +130,6 @@ class CardCounter(BasicStrategy):
             sleep(self.sleep_int)
         return None
 
-    def _apply_deviations(self) -> None:
-        self.decision_tree['pair'][False]['ace'][False]['total'][16]['upcard'][9] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 5 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][16]['upcard'][10] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 0 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][15]['upcard'][10] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 4 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][13]['upcard'][2] = \
-            lambda: 'h' if self.dealer_ref.get_true_count() < -1 else 's'
-        self.decision_tree['pair'][False]['ace'][False]['total'][13]['upcard'][3] = \
-            lambda: 'h' if self.dealer_ref.get_true_count() < -2 else 's'
-        self.decision_tree['pair'][False]['ace'][False]['total'][12]['upcard'][2] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 4 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][12]['upcard'][3] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 2 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][12]['upcard'][4] = \
-            lambda: 's' if self.dealer_ref.get_true_count() >= 0 else 's'
-        self.decision_tree['pair'][False]['ace'][False]['total'][12]['upcard'][5] = \
-            lambda: 'h' if self.dealer_ref.get_true_count() < -1 else 's'
-        self.decision_tree['pair'][False]['ace'][False]['total'][12]['upcard'][6] = \
-            lambda: 'h' if self.dealer_ref.get_true_count() < -1 else 's'
-        self.decision_tree['pair'][False]['ace'][False]['total'][11]['upcard'][11] = \
-            lambda: 'd' if self.dealer_ref.get_true_count() >= -1 else 'd'
-        self.decision_tree['pair'][False]['ace'][False]['total'][10]['upcard'][10] = \
-            lambda: 'd' if self.dealer_ref.get_true_count() >= 4 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][10]['upcard'][11] = \
-            lambda: 'd' if self.dealer_ref.get_true_count() >= 4 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][9]['upcard'][2] = \
-            lambda: 'd' if self.dealer_ref.get_true_count() >= 1 else 'h'
-        self.decision_tree['pair'][False]['ace'][False]['total'][9]['upcard'][7] = \
-            lambda: 'd' if self.dealer_ref.get_true_count() >= 4 else 'h'
-        self.decision_tree['pair'][True]['ace'][False]['total'][20]['upcard'][5] = \
-            lambda: 'y' if self.dealer_ref.get_true_count() >= 5 else 's'
-        self.decision_tree['pair'][True]['ace'][False]['total'][20]['upcard'][6] = \
-            lambda: 'y' if self.dealer_ref.get_true_count() >= 5 else 's'
-        return None
-
 
 if __name__ == '__main__':
     table = Table(players=2, decks=6, minimum_bet=50, penetration=0.75)
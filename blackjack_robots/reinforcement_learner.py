@@ -1,9 +1,11 @@
 from time import sleep
 from typing import Any, List, Optional
 
-from numpy import argmax, array, empty, hstack, vstack, max as npmax, min as npmin, ndarray, zeros
+from numpy import argmax, array, full, intp, ndarray, zeros
 
+from ai.experience_buffer import ExperienceBuffer
 from ai.neural_network import InputMatrix, MultilayerPerceptron, NeuralNetwork, OutputMatrix
+from ai.policy_cache import PolicyCache
 from blackjack import Card, Hand, Player, Table
 from blackjack_robots.basic_strategy import BasicStrategy
 
@@ -12,51 +14,86 @@ State = ndarray[6, int]  # NDArray(Pair, Ace, Hand_Min, Hand_Max, Upcard, Insura
 Action = ndarray[5, float]  # NDArray(prob h, prob s, prob d, prob y, prob sur)
 
 
-class Node:
+class Episode:
+    """
+    This is the decision tree of one round, stored flat so that every node is an index into the arrays.
+    Node zero is the root and a node is always added after its parent, so the parent index is lower.
+    Nodes that are not decided are leaves, which only hold the reward of a hand.
+    """
+
+    __slots__ = ('actions', 'decided', 'parents', 'rewards', 'size', 'states')
+    _arrays = ('states', 'actions', 'rewards', 'parents', 'decided')
+
+    def __init__(self, number_of_features: int, number_of_targets: int, capacity: int = 16):
+        self.states: InputMatrix = zeros(shape=(capacity, number_of_features), dtype=int)
+        self.actions: OutputMatrix = zeros(shape=(capacity, number_of_targets), dtype=float)
+        self.rewards: ndarray[Any, int] = zeros(shape=(capacity,), dtype=int)
+        self.parents: ndarray[Any, int] = full(shape=(capacity,), fill_value=-1, dtype=intp)
+        self.decided: ndarray[Any, bool] = zeros(shape=(capacity,), dtype=bool)
+        self.size = 1
+
+    def add(self, parent: int) -> int:
+        if self.size == len(self.parents):
+            self._grow()
+        node = self.size
+        self.parents[node] = parent
+        self.size += 1
+        return node
 
-    def __init__(self, state: State = zeros(shape=(6,), dtype=int),
-                 action: Action = zeros(shape=(5,), dtype=int),
-                 reward: int = 0,
-                 parent: Optional['Node'] = None,
-                 children: Optional[List['Node']] = None):
-        self.state = state
-        self.action = action
-        self.reward = reward
-        self.parent = parent
-        if children:
-            self.children = children
-        else:
-            self.children = []
+    def copy(self) -> 'Episode':
+        episode = Episode(self.states.shape[1], self.actions.shape[1], capacity=self.size)
+        for name in self._arrays:
+            getattr(episode, name)[:] = getattr(self, name)[:self.size]
+        episode.size = self.size
+        return episode
+
+    def decide(self, node: int, state: State, action: Action) -> None:
+        self.states[node], self.actions[node], self.decided[node] = state, action, True
+        return None
+
+    def record(self, experience: ExperienceBuffer) -> None:
+        """This adds every decided state-action pair to the experience with its reward to go."""
+        decided = self.decided[:self.size]
+        experience.extend(self.states[:self.size][decided], self.actions[:self.size][decided],
+                          self.reward_to_go()[decided])
+        return None
+
+    def reset(self) -> None:
+        self.states[:self.size], self.actions[:self.size], self.rewards[:self.size] = 0, 0.0, 0
+        self.parents[:self.size], self.decided[:self.size] = -1, False
+        self.size = 1
+        return None
 
-    def calc_reward(self) -> int:
+    def reward_to_go(self) -> ndarray[Any, int]:
         """
         The reward given to a state-action pair before a split
         should be a sum of all rewards after the split.
 
         For a node n with reward r:
             the calculated reward r' is given by
-            r'(n) = sum(ri) from i = n (node number) to i = c (number of children)
+            r'(n) = r(n) + sum(r'(c)) over the children c of n
+        Every child comes after its parent, so one pass in reverse adds up every subtree.
         """
-        rewards = []
-
-        # This is a depth first search for rewards.
-        def recurse(node: 'Node') -> None:
-            rewards.append(node.reward)
-            for child in node.children:
-                recurse(child)
-            return None
-
-        recurse(self)
-        return sum(rewards)
-
-    def get_root_node(self) -> 'Node':
-        node = self
-        while node.parent:
-            node = node.parent
-        return node
+        rewards = self.rewards[:self.size].copy()
+        parents = self.parents
+        for node in range(self.size - 1, 0, -1):
+            rewards[parents[node]] += rewards[node]
+        return rewards
+
+    def _grow(self) -> None:
+        for name in self._arrays:
+            old = getattr(self, name)
+            new = zeros(shape=(2 * len(old),) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.parents[self.size:] = -1
+        return None
 
 
 class ReinforcementLearner(BasicStrategy):
+    actions = ['h', 's', 'd', 'y', 'sur']
+    # These bound every state a decision is made in, so the policy is cached over them.
+    state_low, state_high = [0, 0, 2, 2, 2, 0], [1, 1, 21, 31, 11, 1]
 
     def __init__(self, neural_network: NeuralNetwork):
         if not neural_network.instantiated:
@@ -64,20 +101,31 @@ class ReinforcementLearner(BasicStrategy):
         super().__init__()
         self.name = 'Reinforcement Learner'
         self.policy = neural_network
-        self.actions = ['h', 's', 'd', 'y', 'sur']
         self.num_features = 6
         self.num_targets = len(self.actions)
         self.policy.initialize(self.num_features, self.num_targets)
-        self.current_node = Node()
-        self.root_node = self.current_node
-        self.split_queue: List[Node] = []  # This is a FIFO queue.
-        self.reward_queue: List[Node] = []  # This is a FIFO queue.
-        self.state_path_matrix: InputMatrix = empty(shape=(0, self.num_features), dtype=int)
-        self.action_path_matrix: OutputMatrix = empty(shape=(0, self.num_targets), dtype=float)
-        self.reward_path_array: ndarray[Any, int] = empty(shape=(0,), dtype=int)
+        self.policy_cache = PolicyCache(self.policy, self.state_low, self.state_high)
+        self.episode = Episode(self.num_features, self.num_targets)
+        self.current_node = 0  # This is the index of the node in the episode, where zero is the root.
+        self.split_queue: List[int] = []  # This is a FIFO queue.
+        self.reward_queue: List[int] = []  # This is a FIFO queue.
+        self.doubled_node: Optional[int] = None  # This is the node of a hand doubled before it is dealt its card.
+        self.experience = ExperienceBuffer(self.num_features, self.num_targets)
+
+    @property
+    def action_path_matrix(self) -> OutputMatrix:
+        return self.experience.actions
+
+    @property
+    def reward_path_array(self) -> ndarray[Any, int]:
+        return self.experience.rewards
+
+    @property
+    def state_path_matrix(self) -> InputMatrix:
+        return self.experience.states
 
     def action_indices_of(self, state_matrix: InputMatrix) -> ndarray[Any, int]:
-        prob_actions: OutputMatrix = self.policy.forward_propagation(state_matrix)
+        prob_actions: OutputMatrix = self.policy_cache.forward_propagation(state_matrix)
         return argmax(prob_actions, axis=1)
 
     def ask_for_insurance(self) -> None:
@@ -94,7 +142,18 @@ class ReinforcementLearner(BasicStrategy):
         return None
 
     def bust(self, hand: Hand) -> None:
-        self.current_node.reward = -hand.bet
+        if self.doubled_node is not None:
+            # A doubled hand waits in the queue for the dealer, unless it busts. The next node was already
+            # taken when it was doubled, so only a round with no hands left is finished here.
+            node, self.doubled_node = self.doubled_node, None
+            self.reward_queue.remove(node)
+            self.episode.rewards[node] = -hand.bet
+            self.hands.remove(hand)
+            self.show_score(hand, 'lost')
+            if not self.hands:
+                self._reset()
+            return None
+        self.episode.rewards[self.current_node] = -hand.bet
         self.hands.remove(hand)
         self.show_score(hand, 'lost')
         self._reset()
@@ -106,19 +165,19 @@ class ReinforcementLearner(BasicStrategy):
         return self.choices[choice](hand)
 
     def decision(self, hand: Hand, up_card: Card, insurance: int = 0) -> str:
+        self.doubled_node = None
         state: State = self.get_current_state(hand, up_card, insurance)
-        action: Action = self.policy.forward_propagation(array([state]))
-        self.current_node.state, self.current_node.action = state, action.flatten()
-        child = Node(parent=self.current_node)
-        self.current_node.children.append(child)
-        self.current_node = child
-        action_index = argmax(action, axis=1).item()
+        action: Action = self.policy_cache.lookup(state)
+        self.episode.decide(self.current_node, state, action)
+        self.current_node = self.episode.add(parent=self.current_node)
+        action_index = int(argmax(action))
         return self.actions[action_index]
 
     def double(self, hand: Hand) -> str:
         if len(hand.cards) == 2:
             if self.chips >= hand.bet:
                 self.reward_queue.append(self.current_node)
+                self.doubled_node = self.current_node
                 self.chips -= hand.bet
                 self.total_bet += hand.bet
                 hand.bet += hand.bet
@@ -128,19 +187,18 @@ class ReinforcementLearner(BasicStrategy):
 
     @staticmethod
     def get_current_state(hand: Hand, up_card: Card, insurance: int = 0) -> State:
-        hand_min, hand_max = npmin(hand.value), npmax(hand.value)
+        hand_min, hand_max = hand.hard, hand.hard + 10 * hand.soft
         is_pair = int(hand.pair())
         has_ace = int(hand.has_ace())
-        up_card_max = npmax(up_card.get_value())
+        up_card_max = up_card.max_value
         state = array([is_pair, has_ace, hand_min, hand_max, up_card_max, insurance])
         return state
 
     def lost(self, hand: Hand) -> None:
         if self.reward_queue:
-            node = self.reward_queue.pop(0)
-            node.reward = -hand.bet
+            self.episode.rewards[self.reward_queue.pop(0)] = -hand.bet
         else:
-            self.current_node.reward = -hand.bet
+            self.episode.rewards[self.current_node] = -hand.bet
         self.hands.remove(hand)
         self.show_score(hand, 'lost')
         self._reset()
@@ -148,10 +206,9 @@ class ReinforcementLearner(BasicStrategy):
 
     def push(self, hand: Hand) -> None:
         if self.reward_queue:
-            node = self.reward_queue.pop(0)
-            node.reward = 0
+            self.episode.rewards[self.reward_queue.pop(0)] = 0
         else:
-            self.current_node.reward = 0
+            self.episode.rewards[self.current_node] = 0
         self.chips += hand.bet
         self.hands.remove(hand)
         self.show_score(hand, 'tied')
@@ -160,10 +217,9 @@ class ReinforcementLearner(BasicStrategy):
 
     def split(self, hand: Hand) -> str:
         if self.chips >= hand.bet and hand.pair():
-            split_node = self.current_node.parent
-            child1, child2 = Node(parent=split_node), Node(parent=split_node)
-            split_node.children = [child1, child2]
-            self.split_queue.extend([child1, child2])
+            # The leaf after the split decision never gets a reward, so it is left in the episode.
+            split_node = self.episode.parents[self.current_node]
+            self.split_queue.extend([self.episode.add(split_node), self.episode.add(split_node)])
             self.chips -= hand.bet
             self.total_bet += hand.bet
             self._reset()
@@ -178,7 +234,7 @@ class ReinforcementLearner(BasicStrategy):
 
     def surrender(self, hand: Hand) -> str:
         if len(hand.cards) == 2:
-            self.current_node.reward = -hand.bet // 2
+            self.episode.rewards[self.current_node] = -hand.bet // 2
             self.chips += hand.bet // 2
             self.hands.remove(hand)
             self._reset()
@@ -187,13 +243,14 @@ class ReinforcementLearner(BasicStrategy):
         return 's'
 
     def use_insurance(self, hand: Hand) -> None:
-        # If insurance is bought and used,
-        # the root node has a reward of bet + insurance.
-        self.root_node.reward = self.insurance + hand.bet
+        # If insurance is bought and used, the bet and the insurance are paid back,
+        # so the root node has the net of the round, which is zero, like every other reward.
+        self.episode.rewards[0] = 0
         self.chips += self.insurance + hand.bet
-        print(f"{self.name} insured hand {hand.show(f'{self.name} insured hand ')} for {self.insurance} chips.")
-        print(f'You receive {hand.bet} chips insured with {self.insurance} chips insurance.')
-        sleep(self.sleep_int)
+        if not self.headless:
+            print(f"{self.name} insured hand {hand.show(f'{self.name} insured hand ')} for {self.insurance} chips.")
+            print(f'You receive {hand.bet} chips insured with {self.insurance} chips insurance.')
+            sleep(self.sleep_int)
         if self.hands:
             self.hands.remove(hand)
         self.insurance = 0
@@ -202,10 +259,9 @@ class ReinforcementLearner(BasicStrategy):
 
     def won(self, hand: Hand) -> None:
         if self.reward_queue:
-            node = self.reward_queue.pop(0)
-            node.reward = hand.bet
+            self.episode.rewards[self.reward_queue.pop(0)] = hand.bet
         else:
-            self.current_node.reward = hand.bet
+            self.episode.rewards[self.current_node] = hand.bet
         self.chips += 2 * hand.bet
         self.hands.remove(hand)
         self.show_score(hand, 'won')
@@ -213,7 +269,7 @@ class ReinforcementLearner(BasicStrategy):
         return None
 
     def won_blackjack(self, hand: Hand) -> None:
-        self.current_node.reward = int(hand.bet * 1.5)
+        self.episode.rewards[self.current_node] = int(hand.bet * 1.5)
         self.chips += int(hand.bet * 2.5)
         self.hands.remove(hand)
         self.show_score(hand, 'won', blackjack=True)
@@ -221,26 +277,14 @@ class ReinforcementLearner(BasicStrategy):
         return None
 
     def _reset(self) -> None:
-
-        def recurse(node: Node) -> None:
-            # Leaf nodes are empty.
-            if node.state.any():
-                total_reward = node.calc_reward()
-                self.state_path_matrix = vstack([self.state_path_matrix, node.state])
-                self.action_path_matrix = vstack([self.action_path_matrix, node.action])
-                self.reward_path_array = hstack([self.reward_path_array, total_reward])
-            for child in node.children:
-                recurse(child)
-            return None
-
         if not self.hands:
-            if self.root_node.state.any():
+            if self.episode.decided[0]:
                 if self.insurance:
-                    self.root_node.reward = -self.insurance
+                    self.episode.rewards[0] = -self.insurance
                     self.insurance = 0
-                recurse(self.root_node)
-            self.current_node = Node()
-            self.root_node = self.current_node
+                self.episode.record(self.experience)
+            self.episode.reset()
+            self.current_node, self.doubled_node = 0, None
         if self.split_queue:
             self.current_node = self.split_queue.pop(0)
         self._your_turn = False
@@ -0,0 +1,151 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from blackjack_simulations.batch_simulator import BatchResult, BatchSimulator, CountingBatchSimulator
+
+
+FloatArray = np.ndarray[Any, float]
+BetFunction = Callable[[FloatArray], FloatArray]  # This maps true counts to bets.
+
+
+class OutcomeTable:
+    """
+    These are the net outcomes of played rounds with the bet and the true count each round was played at.
+    Dividing the net by the bet gives the outcome per unit bet, so the rounds can be replayed with other bets.
+    """
+
+    def __init__(self, net: np.ndarray, bet: np.ndarray, true_count: np.ndarray):
+        played = np.asarray(bet).ravel() > 0
+        self.net: FloatArray = np.asarray(net, dtype=float).ravel()[played]
+        self.bet: FloatArray = np.asarray(bet, dtype=float).ravel()[played]
+        self.true_count: FloatArray = np.asarray(true_count, dtype=float).ravel()[played]
+
+    def __len__(self) -> int:
+        return len(self.net)
+
+    def by_true_count(self, low: int = -10, high: int = 10) -> Dict[int, Tuple[int, float, float]]:
+        """This returns the rounds, mean and variance of the outcome per unit bet for each floored true count."""
+        key = self.keys(low, high)
+        units = self.units()
+        summary = {}
+        for true_count in range(low, high + 1):
+            bucket = units[key == true_count]
+            if len(bucket):
+                summary[true_count] = (len(bucket), bucket.mean(), bucket.var())
+        return summary
+
+    def keys(self, low: int = -10, high: int = 10) -> np.ndarray[Any, int]:
+        return np.clip(np.floor(self.true_count), low, high).astype(int)
+
+    def save(self, path: str) -> None:
+        np.savez(path, net=self.net, bet=self.bet, true_count=self.true_count)
+        return None
+
+    def units(self) -> FloatArray:
+        return self.net / self.bet
+
+    @staticmethod
+    def capture(simulator: BatchSimulator, rounds: int) -> 'OutcomeTable':
+        """The simulator should be given enough chips that no shoe stops betting."""
+        result: BatchResult = simulator.play(rounds)
+        return OutcomeTable(result.net, result.bet, result.true_count)
+
+    @staticmethod
+    def load(path: str) -> 'OutcomeTable':
+        with np.load(path) as arrays:
+            return OutcomeTable(arrays['net'], arrays['bet'], arrays['true_count'])
+
+
+class BankrollEngine:
+    """
+    This resamples captured rounds into many session paths and works on their cumulative sums.
+    A path is ruined in the first round whose bet the chips cannot cover,
+    and a session ends early once its loss reaches the stop loss or its profit reaches the win goal.
+    """
+
+    def __init__(self, outcomes: OutcomeTable, bet: Optional[BetFunction] = None,
+                 seed: Optional[int] = None, max_elements: int = 2 ** 23):
+        if not len(outcomes):
+            raise ValueError('The argument "outcomes" must hold at least one played round.')
+        self.outcomes = outcomes
+        self.rng = np.random.default_rng(seed)
+        self.max_elements = max_elements
+        if bet is None:
+            self._net, self._bet = outcomes.net, outcomes.bet
+        else:
+            self._bet = np.asarray(bet(outcomes.true_count), dtype=float)
+            self._net = outcomes.units() * self._bet
+
+    def profit_probability(self, bankrolls: List[float], sessions: int, rounds: int, paths: int = 10000,
+                           stop_loss: Optional[float] = None, win_goal: Optional[float] = None) -> FloatArray:
+        """
+        This is the probability, for each bankroll, that a number of sessions played back to back
+        end with more chips than they started with and without ruin.
+        """
+        bankrolls = np.asarray(bankrolls, dtype=float)
+        profit = np.zeros(len(bankrolls))
+        for chunk in self._chunks(paths, sessions * rounds):
+            need, net, _ = self._session(chunk * sessions, rounds, stop_loss, win_goal)
+            session_need, session_net = need[:, -1].reshape(chunk, sessions), net.reshape(chunk, sessions)
+            # Every session needs its own bankroll on top of what the earlier sessions won or lost.
+            carried = session_net.cumsum(axis=1) - session_net
+            total_need = (session_need - carried).max(axis=1)
+            total_net = session_net.sum(axis=1)
+            for i, bankroll in enumerate(bankrolls):
+                profit[i] += np.count_nonzero((total_need <= bankroll) & (total_net > 0))
+        return profit / paths
+
+    def risk_of_ruin(self, bankrolls: List[float], rounds: int, paths: int = 10000,
+                     stop_loss: Optional[float] = None, win_goal: Optional[float] = None) -> FloatArray:
+        return 1.0 - self.survival_curves(bankrolls, rounds, paths, stop_loss, win_goal)[:, -1]
+
+    def survival_curves(self, bankrolls: List[float], rounds: int, paths: int = 10000,
+                        stop_loss: Optional[float] = None, win_goal: Optional[float] = None) -> FloatArray:
+        """This returns the probability of not being ruined after each round, with one row per bankroll."""
+        bankrolls = np.asarray(bankrolls, dtype=float)
+        survived = np.zeros((len(bankrolls), rounds))
+        for chunk in self._chunks(paths, rounds):
+            need, _, _ = self._session(chunk, rounds, stop_loss, win_goal)
+            for i, bankroll in enumerate(bankrolls):
+                survived[i] += np.count_nonzero(need <= bankroll, axis=0)
+        return survived / paths
+
+    def _chunks(self, paths: int, rounds: int) -> Iterator[int]:
+        chunk_size = max(1, self.max_elements // rounds)
+        for start in range(0, paths, chunk_size):
+            yield min(chunk_size, paths - start)
+
+    def _session(self, paths: int, rounds: int, stop_loss: Optional[float],
+                 win_goal: Optional[float]) -> Tuple[FloatArray, FloatArray, np.ndarray[Any, int]]:
+        """
+        This returns the bankroll each path needs to get through every round, which stays fixed after the
+        session stops, the net of each session and the round each session stops at.
+        """
+        sample = self.rng.integers(0, len(self._net), size=(paths, rounds))
+        net, bet = self._net[sample], self._bet[sample]
+        cumulative = net.cumsum(axis=1)
+        need = np.maximum.accumulate(bet - (cumulative - net), axis=1)
+        stop = np.full(paths, rounds - 1)
+        if stop_loss is not None or win_goal is not None:
+            reached = np.zeros((paths, rounds), dtype=bool)
+            if stop_loss is not None:
+                reached |= cumulative <= -stop_loss
+            if win_goal is not None:
+                reached |= cumulative >= win_goal
+            stopped = reached.any(axis=1)
+            stop[stopped] = reached[stopped].argmax(axis=1)
+            path = np.arange(paths)
+            need = np.where(np.arange(rounds) > stop[:, None], need[path, stop][:, None], need)
+        return need, cumulative[np.arange(paths), stop], stop
+
+
+if __name__ == '__main__':
+    table = OutcomeTable.capture(CountingBatchSimulator(shoes=2000, chips=2 ** 40, seed=0), rounds=500)
+    engine = BankrollEngine(table, seed=0)
+    bankrolls_ = [500, 1000, 2000, 5000, 10000]
+    for bankroll_, risk in zip(bankrolls_, engine.risk_of_ruin(bankrolls_, rounds=1000)):
+        print(f'Bankroll {bankroll_}: {risk:.2%} risk of ruin in 1000 rounds.')
+    for sessions_ in [1, 5, 10]:
+        profit_ = engine.profit_probability(bankrolls_, sessions=sessions_, rounds=200, stop_loss=500, win_goal=500)
+        print(f'{sessions_} sessions: ' + '; '.join(f'{b} {p:.2%}' for b, p in zip(bankrolls_, profit_)))
@@ -0,0 +1,290 @@
+from time import time
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+from blackjack_robots.basic_strategy import BasicStrategy, StrategyTable
+from blackjack_robots.card_counter import BetSchedule, CardCounter
+
+
+# Cards are rank codes: A = 1, 2 - 10 = 2 - 10, J = 11, Q = 12, K = 13.
+RankArray = np.ndarray[Any, np.uint8]
+IndexArray = np.ndarray[Any, np.intp]
+
+
+class BatchResult(NamedTuple):
+    # Every array has one row per round and one column per shoe.
+    net: np.ndarray[Any, np.int64]
+    bet: np.ndarray[Any, np.int64]
+    true_count: np.ndarray[Any, float]
+
+
+class BatchSimulator:
+    """
+    This plays one basic strategy seat at each of many independent shoes in lockstep.
+    Every step of a round, from the deal to the settlement, is a vectorized operation over the shoes,
+    and the rules are the same as those of the Table class.
+    Each reshuffle is a full shuffle of the shoe followed by a burned card.
+    """
+    hard_values = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10], dtype=np.int64)
+    # Hi-Lo Card Counting System
+    count_values = np.array([0, -1, 1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1], dtype=np.int64)
+    playing, standing, finished = 0, 1, 2
+    surrender_fallback = 'h'  # This is the choice played when a surrender is not allowed.
+
+    def __init__(self, shoes: int, decks: int = 6, minimum_bet: int = 25, penetration: float = 0.75,
+                 chips: int = 1000, seed: Optional[int] = None):
+        if not 0.0 < penetration < 1.0:
+            penetration = 0.75
+        self.n_shoes = shoes
+        self.decks = decks
+        self.minimum_bet = minimum_bet
+        self.cut_off = int(52 * decks * penetration)
+        self.rng = np.random.default_rng(seed)
+        self.strategy = BasicStrategy.strategy_table
+        self.shoes: np.ndarray[Any, np.uint8] = np.tile(np.repeat(np.arange(1, 14, dtype=np.uint8), 4), (shoes, decks))
+        self.position = np.zeros(shoes, dtype=np.int64)
+        self.running_count = np.zeros(shoes, dtype=np.int64)
+        self.chips = np.full(shoes, chips, dtype=np.int64)
+        self.rounds = np.zeros(shoes, dtype=np.int64)
+        self.active = np.ones(shoes, dtype=bool)
+        self._shuffle(np.arange(shoes))
+        self.position[:] = 0
+        self.running_count[:] = 0
+
+    def play(self, rounds: int) -> BatchResult:
+        net = np.zeros((rounds, self.n_shoes), dtype=np.int64)
+        bet = np.zeros((rounds, self.n_shoes), dtype=np.int64)
+        true_count = np.zeros((rounds, self.n_shoes), dtype=float)
+        for i in range(rounds):
+            net[i], bet[i], true_count[i] = self.play_round()
+        return BatchResult(net, bet, true_count)
+
+    def play_round(self) -> BatchResult:
+        """This plays one round at every shoe whose player can still cover the bet."""
+        reshuffle = np.flatnonzero(self.position >= self.cut_off)
+        if len(reshuffle):
+            self._shuffle(reshuffle)
+        true_count = self.true_count(np.arange(self.n_shoes))
+        bet = self._bet(true_count)
+        self.active &= bet <= self.chips
+        bet[~self.active] = 0
+        shoe = np.flatnonzero(self.active)
+        chips_before = self.chips.copy()
+        self.chips[shoe] -= bet[shoe]
+        self.rounds[shoe] += 1
+        if len(shoe):
+            self._play_hands(shoe, bet[shoe])
+        return BatchResult(self.chips - chips_before, bet, true_count)
+
+    def run(self, rounds: int) -> float:
+        """This returns the number of rounds played per second."""
+        start = time()
+        self.play(rounds)
+        return self.rounds.sum() / (time() - start)
+
+    def true_count(self, shoe: IndexArray) -> np.ndarray[Any, float]:
+        round_to_nearest_deck = 0.25
+        decks_remaining = (52 * self.decks - self.position[shoe]) / 52
+        decks_remaining = np.maximum(np.round(decks_remaining / round_to_nearest_deck), 1) * round_to_nearest_deck
+        return self.running_count[shoe] / decks_remaining
+
+    def _bet(self, true_count: np.ndarray[Any, float]) -> np.ndarray[Any, np.int64]:
+        return np.full(self.n_shoes, self.minimum_bet, dtype=np.int64)
+
+    def _deal(self, shoe: IndexArray, face_up: bool = True) -> RankArray:
+        """The shoe indices must be unique."""
+        cards = self.shoes[shoe, self.position[shoe]]
+        self.position[shoe] += 1
+        if face_up:
+            self.running_count[shoe] += self.count_values[cards]
+        return cards
+
+    def _decide(self, lane: IndexArray, shoe: IndexArray, pair: np.ndarray, hard: np.ndarray,
+                ace: np.ndarray, upcard: np.ndarray) -> np.ndarray[Any, int]:
+        soft = ace & (hard + 10 <= 21)
+        total = np.where(soft, hard + 10, hard)
+        return self.strategy.decide(pair.astype(np.intp), soft.astype(np.intp), total, upcard,
+                                    self.true_count(shoe))
+
+    def _insure(self, shoe: IndexArray, hard: np.ndarray, ace: np.ndarray,
+                pair: np.ndarray) -> np.ndarray[Any, bool]:
+        return np.zeros(len(shoe), dtype=bool)
+
+    def _settle(self, shoe: IndexArray, lane_shoe: IndexArray, lane_parent: IndexArray,
+                lane_net: np.ndarray[Any, np.int64]) -> None:
+        """
+        This is called once the hands of a round are paid, unless the dealer had blackjack,
+        with the net of every lane, not counting insurance, and the lane it was split from, or -1.
+        """
+        return None
+
+    def _shuffle(self, shoe: IndexArray) -> None:
+        self.shoes[shoe] = self.rng.permuted(self.shoes[shoe], axis=1)
+        self.position[shoe] = 0
+        self.running_count[shoe] = 0
+        self._deal(shoe)  # This is the burner card.
+        return None
+
+    def _play_hands(self, shoe: IndexArray, bet: np.ndarray[Any, np.int64]) -> None:
+        hv = self.hard_values
+        card1 = self._deal(shoe)
+        hole = self._deal(shoe, face_up=False)
+        card2 = self._deal(shoe)
+        up = self._deal(shoe)
+        upcard = np.where(up == 1, 11, hv[up])
+        insurance = np.zeros(len(shoe), dtype=np.int64)
+        offered = np.flatnonzero(up == 1)
+        if len(offered):
+            hard, ace = hv[card1[offered]] + hv[card2[offered]], (card1[offered] == 1) | (card2[offered] == 1)
+            price = bet[offered] // 2
+            pair = card1[offered] == card2[offered]
+            buy = self._insure(shoe[offered], hard, ace, pair) & (self.chips[shoe[offered]] >= price)
+            insurance[offered[buy]] = price[buy]
+            self.chips[shoe[offered[buy]]] -= price[buy]
+        dealer_hard = hv[hole] + hv[up]
+        dealer_ace = (hole == 1) | (up == 1)
+        player_blackjack = (hv[card1] + hv[card2] == 11) & ((card1 == 1) | (card2 == 1))
+        dealer_blackjack = (dealer_hard == 11) & dealer_ace
+        if dealer_blackjack.any():
+            peeked = np.flatnonzero(dealer_blackjack)
+            self.running_count[shoe[peeked]] += self.count_values[hole[peeked]]
+            # An insured hand is paid the bet and the insurance, and a blackjack also pushes.
+            self.chips[shoe[peeked]] += ((insurance[peeked] > 0) * (insurance[peeked] + bet[peeked])
+                                         + player_blackjack[peeked] * bet[peeked])
+            remaining = ~dealer_blackjack
+            shoe, bet, card1, card2 = shoe[remaining], bet[remaining], card1[remaining], card2[remaining]
+            hole, dealer_hard, dealer_ace = hole[remaining], dealer_hard[remaining], dealer_ace[remaining]
+            upcard = upcard[remaining]
+        # Each lane is one hand. A split finishes the lane and appends two new lanes.
+        # Lanes of the same shoe are played in the order they are appended, as the Table does.
+        n = len(shoe)
+        lane_shoe = np.arange(n)  # This indexes the arrays of the remaining shoes.
+        lane_bet = bet.copy()
+        lane_hard = hv[card1] + hv[card2]
+        lane_ace = (card1 == 1) | (card2 == 1)
+        lane_cards = np.full(n, 2, dtype=np.int64)
+        lane_first, lane_second = card1.copy(), card2.copy()
+        lane_status = np.full(n, self.playing, dtype=np.int8)
+        lane_fresh = np.ones(n, dtype=bool)
+        lane_parent = np.full(n, -1, dtype=np.intp)
+        lane_net = -bet
+        while True:
+            playing = np.flatnonzero(lane_status == self.playing)
+            if not len(playing):
+                break
+            _, first = np.unique(lane_shoe[playing], return_index=True)
+            lane = playing[first]
+            s = lane_shoe[lane]
+            blackjack = lane_fresh[lane] & (lane_hard[lane] == 11) & lane_ace[lane]
+            lane_fresh[lane] = False
+            if blackjack.any():
+                self.chips[shoe[s[blackjack]]] += lane_bet[lane[blackjack]] * 5 // 2
+                lane_net[lane[blackjack]] += lane_bet[lane[blackjack]] * 5 // 2
+                lane_status[lane[blackjack]] = self.finished
+                lane, s = lane[~blackjack], s[~blackjack]
+                if not len(lane):
+                    continue
+            cards, hard = lane_cards[lane], lane_hard[lane]
+            pair = (cards == 2) & (lane_first[lane] == lane_second[lane])
+            choice = self._decide(lane, shoe[s], pair, hard, lane_ace[lane], upcard[s])
+            codes = StrategyTable.codes
+            two_cards = cards == 2
+            chips = self.chips[shoe[s]]
+            choice = np.where(choice == codes['ds'], np.where(two_cards, codes['d'], codes['s']), choice)
+            can_double = two_cards & (chips >= lane_bet[lane])
+            choice = np.where((choice == codes['d']) & ~can_double, codes['h'], choice)
+            can_split = pair & (chips >= lane_bet[lane])
+            choice = np.where((choice == codes['y']) & ~can_split, codes['s'], choice)
+            choice = np.where((choice == codes['sur']) & ~two_cards, codes[self.surrender_fallback], choice)
+            lane_status[lane[choice == codes['s']]] = self.standing
+            surrender = lane[choice == codes['sur']]
+            self.chips[shoe[lane_shoe[surrender]]] += lane_bet[surrender] // 2
+            lane_net[surrender] += lane_bet[surrender] // 2
+            lane_status[surrender] = self.finished
+            double = lane[choice == codes['d']]
+            self.chips[shoe[lane_shoe[double]]] -= lane_bet[double]
+            lane_net[double] -= lane_bet[double]
+            lane_bet[double] *= 2
+            lane_status[double] = self.standing
+            draw = lane[(choice == codes['h']) | (choice == codes['d'])]
+            if len(draw):
+                card = self._deal(shoe[lane_shoe[draw]])
+                lane_hard[draw] += hv[card]
+                lane_ace[draw] |= card == 1
+                lane_cards[draw] += 1
+                lane_status[draw[lane_hard[draw] > 21]] = self.finished
+            split = lane[choice == codes['y']]
+            if len(split):
+                split_shoe = lane_shoe[split]
+                self.chips[shoe[split_shoe]] -= lane_bet[split]
+                lane_status[split] = self.finished
+                # The bet of a split lane is carried by its two new lanes.
+                lane_net[split] += lane_bet[split]
+                new_first = np.concatenate([lane_first[split], lane_second[split]])
+                new_second = np.concatenate([self._deal(shoe[split_shoe]), self._deal(shoe[split_shoe])])
+                k = len(new_first)
+                # The two hands of a split are interleaved, so each pair stays in playing order.
+                order = np.arange(k).reshape(2, -1).T.ravel()
+                new_first, new_second = new_first[order], new_second[order]
+                lane_shoe = np.concatenate([lane_shoe, np.repeat(split_shoe, 2)])
+                lane_bet = np.concatenate([lane_bet, np.repeat(lane_bet[split], 2)])
+                lane_hard = np.concatenate([lane_hard, hv[new_first] + hv[new_second]])
+                lane_ace = np.concatenate([lane_ace, (new_first == 1) | (new_second == 1)])
+                lane_cards = np.concatenate([lane_cards, np.full(k, 2, dtype=np.int64)])
+                lane_first = np.concatenate([lane_first, new_first])
+                lane_second = np.concatenate([lane_second, new_second])
+                lane_status = np.concatenate([lane_status, np.full(k, self.playing, dtype=np.int8)])
+                lane_fresh = np.concatenate([lane_fresh, np.ones(k, dtype=bool)])
+                lane_parent = np.concatenate([lane_parent, np.repeat(split, 2)])
+                lane_net = np.concatenate([lane_net, -np.repeat(lane_bet[split], 2)])
+        self.running_count[shoe] += self.count_values[hole]
+        standing = np.flatnonzero(lane_status == self.standing)
+        if len(standing):
+            # The dealer only draws at shoes where a hand is left standing.
+            dealer = np.unique(lane_shoe[standing])
+            dealer_hard, dealer_ace = dealer_hard[dealer], dealer_ace[dealer]
+            while True:
+                best = np.where(dealer_ace & (dealer_hard + 10 <= 21), dealer_hard + 10, dealer_hard)
+                below = np.flatnonzero(best < 17)
+                if not len(below):
+                    break
+                card = self._deal(shoe[dealer[below]])
+                dealer_hard[below] += hv[card]
+                dealer_ace[below] |= card == 1
+            dealer_total = np.zeros(n, dtype=np.int64)
+            dealer_total[dealer] = np.where(best > 21, 0, best)
+            player_hard = lane_hard[standing]
+            player_total = np.where(lane_ace[standing] & (player_hard + 10 <= 21), player_hard + 10, player_hard)
+            s = lane_shoe[standing]
+            payout = (2 * (player_total > dealer_total[s]) + (player_total == dealer_total[s])) * lane_bet[standing]
+            np.add.at(self.chips, shoe[s], payout)
+            lane_net[standing] += payout
+        self._settle(shoe, lane_shoe, lane_parent, lane_net)
+        return None
+
+
+class CountingBatchSimulator(BatchSimulator):
+    """This plays the card counter's bets, insurance and deviations instead of flat basic strategy."""
+
+    def __init__(self, shoes: int, decks: int = 6, minimum_bet: int = 25, penetration: float = 0.75,
+                 chips: int = 1000, seed: Optional[int] = None, bet_schedule: Optional[BetSchedule] = None):
+        super().__init__(shoes, decks, minimum_bet, penetration, chips, seed)
+        self.strategy = CardCounter.strategy_table
+        self.bet_schedule = bet_schedule if bet_schedule is not None else CardCounter.bet_schedule
+
+    def _bet(self, true_count: np.ndarray[Any, float]) -> np.ndarray[Any, np.int64]:
+        if self.bet_schedule is not None:
+            return self.bet_schedule.bets(true_count, self.minimum_bet)
+        ramp = (self.minimum_bet + self.minimum_bet * true_count).astype(np.int64)
+        return np.where(true_count <= 0.0, self.minimum_bet, ramp)
+
+    def _insure(self, shoe: IndexArray, hard: np.ndarray, ace: np.ndarray,
+                pair: np.ndarray) -> np.ndarray[Any, bool]:
+        return self.true_count(shoe) >= 3
+
+
+if __name__ == '__main__':
+    simulator = CountingBatchSimulator(shoes=10000, seed=0)
+    print(f'{round(simulator.run(1000))} rounds per second.')
+    print(f'{simulator.active.mean():.2%} of card counters SURVIVED 1000 rounds.')
@@ -0,0 +1,149 @@
+import os
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from blackjack_robots.card_counter import BetSchedule, CardCounter
+from blackjack_simulations.bankroll import OutcomeTable
+from blackjack_simulations.batch_simulator import CountingBatchSimulator
+
+
+FloatArray = np.ndarray[Any, float]
+
+
+class SpreadEvaluation(NamedTuple):
+    name: str
+    win_rate: float  # This is the expected net per round in minimum bets.
+    standard_deviation: float  # This is per round in minimum bets.
+    average_bet: float
+    desirability: float  # This is 1000 times the win rate over the standard deviation.
+    risk_of_ruin: float  # This is for the bankroll of the search, and nan without one.
+
+
+class BetSpreadOptimizer:
+    """
+    The outcome per unit bet of a round does not depend on how much is bet, so the win rate and variance of any
+    bet schedule follow from how often each true count is played and the mean and variance of the outcome per
+    unit bet at it, which are collected once. For u units bet at each true count played with frequency f,
+    the win rate per round is sum(f u m) and the variance is sum(f u^2 (v + m^2)) minus the squared win rate,
+    so every candidate schedule is evaluated with a few dot products.
+    """
+
+    def __init__(self, true_counts: np.ndarray, rounds: np.ndarray, mean: FloatArray, variance: FloatArray):
+        self.true_counts = np.asarray(true_counts, dtype=int)
+        self.rounds = np.asarray(rounds, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=float)
+        self.variance = np.asarray(variance, dtype=float)
+        self.frequency = self.rounds / self.rounds.sum()
+
+    def candidates(self, max_spread: float = 8.0) -> Tuple[List[str], FloatArray]:
+        """
+        These are ramps that start raising at a true count and rise by a number of units per true count,
+        capped at every spread up to the maximum, and bets proportional to the Kelly bet of each true count,
+        which is the mean over the second moment, capped the same way. Every bet is at least one unit.
+        """
+        names, units = [], []
+        caps = np.unique(np.append(np.arange(2.0, max_spread), max_spread))
+        for cap in caps:
+            for start in range(0, 4):
+                for slope in [0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0]:
+                    names.append(f'ramp from {start} by {slope} up to {cap:g}')
+                    units.append(np.clip(1 + slope * (self.true_counts - start + 1), 1, cap))
+            kelly = np.where(self.mean > 0, self.mean / np.maximum(self.variance + self.mean ** 2, 1e-12), 0.0)
+            for scale in [10, 20, 50, 100, 200, 500, 1000, 2000]:
+                names.append(f'kelly times {scale} up to {cap:g}')
+                units.append(np.clip(scale * kelly, 1, cap))
+        return names, np.array(units)
+
+    def evaluate(self, units: FloatArray, bankroll: Optional[float] = None) -> Tuple[FloatArray, ...]:
+        """
+        This returns the win rate, standard deviation, average bet and risk of ruin of every row of units,
+        where the risk of ruin of a bankroll in minimum bets is the diffusion approximation exp(-2 w b / s^2).
+        """
+        units = np.atleast_2d(units)
+        win_rate = units @ (self.frequency * self.mean)
+        variance = np.maximum((units ** 2) @ (self.frequency * (self.variance + self.mean ** 2)) - win_rate ** 2, 0.0)
+        average_bet = units @ self.frequency
+        if bankroll is None:
+            risk_of_ruin = np.full(len(units), np.nan)
+        else:
+            with np.errstate(divide='ignore', over='ignore'):
+                risk_of_ruin = np.where(win_rate > 0, np.exp(-2 * win_rate * bankroll / variance), 1.0)
+        return win_rate, np.sqrt(variance), average_bet, risk_of_ruin
+
+    def evaluation(self, schedule: BetSchedule, bankroll: Optional[float] = None,
+                   name: str = 'schedule') -> SpreadEvaluation:
+        units = schedule.units[np.clip(self.true_counts, schedule.low, schedule.high) - schedule.low]
+        return self._evaluations([name], units[None], bankroll)[0]
+
+    def save(self, path: str) -> None:
+        np.savez(path, true_counts=self.true_counts, rounds=self.rounds, mean=self.mean, variance=self.variance)
+        return None
+
+    def search(self, max_spread: float = 8.0, bankroll: Optional[float] = None,
+               max_risk_of_ruin: Optional[float] = None) -> Tuple[BetSchedule, SpreadEvaluation]:
+        """
+        Without a limit on the risk of ruin, the schedule with the highest desirability index is chosen, which is
+        the spread that wins the most for its risk at any bankroll. With a bankroll in minimum bets and a limit,
+        the schedule with the highest win rate whose risk of ruin is within the limit is chosen.
+        """
+        names, units = self.candidates(max_spread)
+        evaluations = self._evaluations(names, units, bankroll)
+        if max_risk_of_ruin is None:
+            scores = [evaluation.desirability for evaluation in evaluations]
+        else:
+            if bankroll is None:
+                raise ValueError('A bankroll must be given with the argument "max_risk_of_ruin".')
+            scores = [evaluation.win_rate if evaluation.risk_of_ruin <= max_risk_of_ruin else -np.inf
+                      for evaluation in evaluations]
+            if max(scores) == -np.inf:
+                raise ValueError(f'No bet spread of up to {max_spread:g} units keeps the risk of ruin within '
+                                 f'{max_risk_of_ruin:g} with a bankroll of {bankroll:g} minimum bets.')
+        best = int(np.argmax(scores))
+        return BetSchedule(dict(zip(self.true_counts.tolist(), units[best].tolist()))), evaluations[best]
+
+    def _evaluations(self, names: List[str], units: FloatArray,
+                     bankroll: Optional[float]) -> List[SpreadEvaluation]:
+        win_rate, deviation, average_bet, risk_of_ruin = self.evaluate(units, bankroll)
+        desirability = 1000 * win_rate / np.maximum(deviation, 1e-12)
+        return [SpreadEvaluation(*row) for row in zip(names, win_rate.tolist(), deviation.tolist(),
+                                                      average_bet.tolist(), desirability.tolist(),
+                                                      risk_of_ruin.tolist())]
+
+    @staticmethod
+    def cached(path: str, shoes: int = 2000, rounds: int = 1000, decks: int = 6, penetration: float = 0.75,
+               seed: Optional[int] = None, low: int = -10, high: int = 10) -> 'BetSpreadOptimizer':
+        """This loads the statistics from the path, or plays the card counter once to collect and save them."""
+        if os.path.exists(path):
+            return BetSpreadOptimizer.load(path)
+        simulator = CountingBatchSimulator(shoes, decks, penetration=penetration, chips=2 ** 40, seed=seed)
+        optimizer = BetSpreadOptimizer.from_outcomes(OutcomeTable.capture(simulator, rounds), low, high)
+        optimizer.save(path)
+        return optimizer
+
+    @staticmethod
+    def from_outcomes(outcomes: OutcomeTable, low: int = -10, high: int = 10) -> 'BetSpreadOptimizer':
+        """A true count that was never played is kept with no rounds, so the true counts stay consecutive."""
+        summary = outcomes.by_true_count(low, high)
+        true_counts = np.arange(low, high + 1)
+        rounds, mean, variance = (np.array([summary.get(true_count, (0, 0.0, 0.0))[i] for true_count in true_counts])
+                                  for i in range(3))
+        return BetSpreadOptimizer(true_counts, rounds, mean, variance)
+
+    @staticmethod
+    def load(path: str) -> 'BetSpreadOptimizer':
+        with np.load(path) as arrays:
+            return BetSpreadOptimizer(arrays['true_counts'], arrays['rounds'], arrays['mean'], arrays['variance'])
+
+
+if __name__ == '__main__':
+    optimizer_ = BetSpreadOptimizer.cached('bet_spread_statistics.npz', seed=0)
+    ramp_ = BetSchedule({true_count: max(1.0, 1.0 + true_count) for true_count in range(-10, 11)})
+    print(optimizer_.evaluation(ramp_, bankroll=1000, name='card counter ramp'))
+    for max_spread_ in [4, 8, 12]:
+        schedule_, evaluation_ = optimizer_.search(max_spread_, bankroll=1000, max_risk_of_ruin=0.05)
+        print(evaluation_)
+    schedule_.save('bet_schedule.json')
+    card_counter = CardCounter()
+    card_counter.load_bet_schedule('bet_schedule.json')
+    print(f'The card counter bets {card_counter.bet_schedule.as_dict()} minimum bets by true count.')
@@ -0,0 +1,109 @@
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from blackjack import Player, Table
+from blackjack_robots.basic_strategy import BasicStrategy
+from blackjack_robots.card_counter import CardCounter
+
+
+FloatArray = np.ndarray[Any, float]
+
+
+class Comparison(NamedTuple):
+    strategy: str
+    baseline: str
+    difference: float  # This is the strategy's mean net per round minus the baseline's.
+    low: float
+    high: float
+    variance_reduction: float  # This is how many times fewer rounds pairing needs than independent shoes.
+
+
+class StrategyComparison:
+    """
+    Every strategy plays at its own Table, and the tables share one seed, so shoe n is the same cards for every
+    strategy. The tables play in lockstep: after every round, each table burns the cards the other strategies
+    used and it did not, face up, so every strategy starts every round at the same card with the same count,
+    and round i of one strategy is paired with round i of another. The intervals are clustered by shoe,
+    since the rounds of a shoe share its cards.
+    """
+
+    def __init__(self, strategies: Dict[str, Callable[[], Player]], seed: int, decks: int = 6,
+                 minimum_bet: int = 25, penetration: float = 0.75, chips: int = 2 ** 40):
+        if not strategies:
+            raise ValueError('The argument "strategies" must name at least one strategy.')
+        self.names = list(strategies)
+        self.tables: List[Table] = []
+        for strategy in strategies.values():
+            player = strategy()
+            player.chips = chips
+            table = Table(players=1, decks=decks, minimum_bet=minimum_bet, penetration=penetration, seed=seed)
+            table.players = [player]
+            self.tables.append(table)
+        self.net: FloatArray = np.empty((len(self.names), 0))  # This is the net of each strategy in each round.
+        self.shoe: np.ndarray[Any, int] = np.empty(0, dtype=int)
+
+    def compare(self, baseline: str, confidence: float = 0.95) -> List[Comparison]:
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        base = self.net[self.names.index(baseline)]
+        comparisons = []
+        for name, net in zip(self.names, self.net):
+            if name == baseline:
+                continue
+            difference = net - base
+            paired = self._variance_of_mean(difference)
+            unpaired = self._variance_of_mean(net) + self._variance_of_mean(base)
+            half_width = z * np.sqrt(paired)
+            comparisons.append(Comparison(name, baseline, difference.mean(), difference.mean() - half_width,
+                                          difference.mean() + half_width, unpaired / paired if paired else np.inf))
+        return comparisons
+
+    def differences(self, baseline: str) -> Dict[str, FloatArray]:
+        """These are the paired differences in net per round between every strategy and the baseline."""
+        base = self.net[self.names.index(baseline)]
+        return {name: net - base for name, net in zip(self.names, self.net) if name != baseline}
+
+    def expected_value(self, name: str, confidence: float = 0.95) -> Tuple[float, float, float]:
+        """This is the mean net per round of a strategy with its confidence interval."""
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        net = self.net[self.names.index(name)]
+        half_width = z * np.sqrt(self._variance_of_mean(net))
+        return net.mean(), net.mean() - half_width, net.mean() + half_width
+
+    def play(self, rounds: int) -> None:
+        net = np.empty((len(self.tables), rounds))
+        shoe = np.empty(rounds, dtype=int)
+        for i in range(rounds):
+            for j, table in enumerate(self.tables):
+                one_round = iter([True, False])
+                outcomes = table.simulate(lambda: next(one_round))
+                if not outcomes:
+                    raise ValueError(f'The {self.names[j]} strategy cannot cover the minimum bet.')
+                net[j, i], shoe[i] = outcomes[0].net, outcomes[0].shoe
+            dealt = [table.dealer.shoe.deck.cards_dealt for table in self.tables]
+            for table, cards in zip(self.tables, dealt):
+                table.dealer.burn(max(dealt) - cards)
+        self.net = np.concatenate([self.net, net], axis=1)
+        self.shoe = np.append(self.shoe, shoe)
+        return None
+
+    def _variance_of_mean(self, values: FloatArray) -> float:
+        """This is the cluster-robust variance of the mean of per round values, with the shoes as clusters."""
+        _, cluster = np.unique(self.shoe, return_inverse=True)
+        sums = np.bincount(cluster, weights=values - values.mean())
+        if len(sums) < 2:
+            raise ValueError('At least two shoes must be played to estimate an error.')
+        return len(sums) / (len(sums) - 1) * np.sum(sums ** 2) / len(values) ** 2
+
+
+if __name__ == '__main__':
+    comparison = StrategyComparison({'basic_strategy': BasicStrategy, 'card_counter': CardCounter}, seed=0)
+    comparison.play(100000)
+    for name_ in comparison.names:
+        ev_, low_, high_ = comparison.expected_value(name_)
+        print(f'{name_}: {ev_:.3f} chips per round, 95% CI [{low_:.3f}, {high_:.3f}].')
+    for result in comparison.compare('basic_strategy'):
+        print(f'{result.strategy} - {result.baseline}: {result.difference:.3f} chips per round, '
+              f'95% CI [{result.low:.3f}, {result.high:.3f}], '
+              f'{result.variance_reduction:.1f} times fewer rounds than independent shoes.')
@@ -0,0 +1,249 @@
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from blackjack_robots.basic_strategy import BasicStrategy
+
+
+# Counts[i] is the number of cards left in the shoe with a hard value of i + 1, so aces are first and
+# tens, jacks, queens and kings are last.
+Counts = Tuple[int, ...]
+# The dealer's final total is 17, 18, 19, 20, 21 or bust.
+DealerProbabilities = Tuple[float, float, float, float, float, float]
+# (Pair, Ace, Total, Upcard): {Choice: Expected Value Per Unit Bet}
+EVTable = Dict[Tuple[bool, bool, int, int], Dict[str, float]]
+
+
+def shoe_counts(decks: int, penetration: float = 0.0) -> Counts:
+    """
+    This is the composition of a full shoe. With a penetration, it is scaled down to the average number of
+    cards left while the shoe is dealt, which is the composition the decisions are made against on average.
+    """
+    remaining = 4 * decks * (1.0 - penetration / 2)
+    return tuple(max(1, round(remaining)) for _ in range(9)) + (max(1, round(4 * remaining)),)
+
+
+def remove(counts: Counts, *args: int) -> Counts:
+    """The arguments are the values of the cards, where an ace is 11."""
+    counts = list(counts)
+    for value in args:
+        i = 0 if value == 11 else value - 1
+        if not counts[i]:
+            raise ValueError(f'There are no cards with a value of {value} left to remove.')
+        counts[i] -= 1
+    return tuple(counts)
+
+
+class ExpectedValue:
+    """
+    This calculates the exact expected values per unit bet of each choice by enumerating the remaining cards,
+    using the rules of the Table: the dealer stands on soft 17 and peeks for blackjack,
+    doubling is allowed on any two cards, including after a split, and a blackjack pays 3:2.
+    A split is valued as two hands that are each played without resplitting.
+    Dealer probabilities are cached by (upcard, counts) in a bounded LRU cache.
+    """
+
+    def __init__(self, cache_size: int = 2 ** 16):
+        self.dealer_probabilities = lru_cache(maxsize=cache_size)(self._dealer_probabilities)
+        self._dealer_draw = lru_cache(maxsize=4 * cache_size)(self._dealer_draw)
+        self._hit = lru_cache(maxsize=4 * cache_size)(self._hit)
+
+    def clear(self) -> None:
+        self.dealer_probabilities.cache_clear()
+        self._dealer_draw.cache_clear()
+        self._hit.cache_clear()
+        return None
+
+    def evaluate(self, cards: List[int], upcard: int, counts: Counts, surrender: bool = False) -> Dict[str, float]:
+        """
+        The cards and the upcard are values, where an ace is 11,
+        and the counts must already exclude the player's cards and the upcard.
+        """
+        hard, soft = self._add(0, False, *cards)
+        evs = {'s': self._stand(hard, soft, upcard, counts), 'h': self._hit(hard, soft, upcard, counts)}
+        if len(cards) == 2:
+            evs['d'] = self._double(hard, soft, upcard, counts)
+            if cards[0] == cards[1]:
+                evs['y'] = self._split(cards[0], upcard, counts)
+            if surrender:
+                evs['sur'] = -0.5
+        return evs
+
+    def table(self, decks: int, penetration: float = 0.0, surrender: bool = False) -> EVTable:
+        """This evaluates a representative hand for every cell of the basic strategy decision tree."""
+        full_shoe = shoe_counts(decks, penetration)
+        table = {}
+        for pair, ace, total, cards in self._representatives():
+            for upcard in range(2, 12):
+                counts = remove(full_shoe, *cards, upcard)
+                evs = self.evaluate(cards, upcard, counts, surrender)
+                if not pair:
+                    # A hard 20 is made of two tens of different ranks, which the Table does not split.
+                    evs.pop('y', None)
+                table[(pair, ace, total, upcard)] = evs
+        return table
+
+    def _dealer_probabilities(self, upcard: int, counts: Counts) -> DealerProbabilities:
+        """These are conditioned on the dealer not having blackjack, because the dealer peeks first."""
+        hard, soft = self._add(0, False, upcard)
+        excluded = {11: 9, 10: 0}.get(upcard)
+        n = sum(counts) - (counts[excluded] if excluded is not None else 0)
+        probabilities = [0.0] * 6
+        for i, count in enumerate(counts):
+            if count and i != excluded:
+                drawn = counts[:i] + (count - 1,) + counts[i + 1:]
+                for j, p in enumerate(self._dealer_draw(hard + i + 1, soft or i == 0, drawn)):
+                    probabilities[j] += count / n * p
+        return tuple(probabilities)
+
+    def _dealer_draw(self, hard: int, soft: bool, counts: Counts) -> DealerProbabilities:
+        if hard > 21:
+            return 0.0, 0.0, 0.0, 0.0, 0.0, 1.0
+        total = hard + 10 if soft and hard <= 11 else hard
+        if total >= 17:
+            probabilities = [0.0] * 6
+            probabilities[total - 17] = 1.0
+            return tuple(probabilities)
+        n = sum(counts)
+        probabilities = [0.0] * 6
+        for i, count in enumerate(counts):
+            if count:
+                drawn = counts[:i] + (count - 1,) + counts[i + 1:]
+                for j, p in enumerate(self._dealer_draw(hard + i + 1, soft or i == 0, drawn)):
+                    probabilities[j] += count / n * p
+        return tuple(probabilities)
+
+    def _double(self, hard: int, soft: bool, upcard: int, counts: Counts) -> float:
+        n = sum(counts)
+        ev = 0.0
+        for i, count in enumerate(counts):
+            if count:
+                drawn = counts[:i] + (count - 1,) + counts[i + 1:]
+                ev += count / n * self._stand(hard + i + 1, soft or i == 0, upcard, drawn)
+        return 2 * ev
+
+    def _hit(self, hard: int, soft: bool, upcard: int, counts: Counts) -> float:
+        n = sum(counts)
+        ev = 0.0
+        for i, count in enumerate(counts):
+            if count:
+                new_hard = hard + i + 1
+                if new_hard > 21:
+                    ev -= count / n
+                    continue
+                drawn = counts[:i] + (count - 1,) + counts[i + 1:]
+                stand = self._stand(new_hard, soft or i == 0, upcard, drawn)
+                if new_hard == 21 or (soft or i == 0) and new_hard == 11:
+                    ev += count / n * stand
+                else:
+                    ev += count / n * max(stand, self._hit(new_hard, soft or i == 0, upcard, drawn))
+        return ev
+
+    @staticmethod
+    def _add(hard: int, soft: bool, *args: int) -> Tuple[int, bool]:
+        for value in args:
+            hard += 1 if value == 11 else value
+            soft = soft or value == 11
+        return hard, soft
+
+    @staticmethod
+    def _representatives() -> List[Tuple[bool, bool, int, List[int]]]:
+        hands = []
+        for total in range(5, 22):
+            if total <= 11:
+                cards = [2, total - 2]
+            elif total <= 20:
+                cards = [10, total - 10]
+            else:
+                cards = [10, 6, 5]
+            hands.append((False, False, total, cards))
+        for total in range(13, 22):
+            hands.append((False, True, total, [11, total - 11] if total < 21 else [11, 4, 6]))
+        for value in range(2, 11):
+            hands.append((True, False, 2 * value, [value, value]))
+        hands.append((True, True, 12, [11, 11]))
+        return hands
+
+    def _split(self, value: int, upcard: int, counts: Counts) -> float:
+        n = sum(counts)
+        ev = 0.0
+        for i, count in enumerate(counts):
+            if count:
+                drawn = counts[:i] + (count - 1,) + counts[i + 1:]
+                hard, soft = self._add(0, False, value, i + 1 if i else 11)
+                if soft and hard == 11:
+                    # The Table pays a split hand of 21 as a blackjack.
+                    ev += count / n * 1.5
+                    continue
+                ev += count / n * max(self._stand(hard, soft, upcard, drawn), self._hit(hard, soft, upcard, drawn),
+                                      self._double(hard, soft, upcard, drawn))
+        return 2 * ev
+
+    def _stand(self, hard: int, soft: bool, upcard: int, counts: Counts) -> float:
+        if hard > 21:
+            return -1.0
+        total = hard + 10 if soft and hard <= 11 else hard
+        dealer = self.dealer_probabilities(upcard, counts)
+        ev = dealer[5]
+        for j, p in enumerate(dealer[:5]):
+            dealer_total = 17 + j
+            ev += p * ((total > dealer_total) - (total < dealer_total))
+        return ev
+
+
+def decision_tree(table: EVTable) -> Dict:
+    """This builds a decision tree in the format of BasicStrategy.decision_tree from a table of expected values."""
+    tree = {'pair': {}}
+    for (pair, ace, total, upcard), evs in table.items():
+        choices = tree['pair'].setdefault(pair, {'ace': {}})['ace'].setdefault(ace, {'total': {}})['total']
+        choices.setdefault(total, {'upcard': {}})['upcard'][upcard] = best_choice(evs)
+    return tree
+
+
+def best_choice(evs: Dict[str, float]) -> str:
+    """A double falls back to a hit in the Table, so "ds" marks a double that should fall back to a stand."""
+    choice = max(evs, key=evs.get)
+    if choice == 'd' and evs['s'] > evs['h']:
+        return 'ds'
+    return choice
+
+
+def load_table(path: str) -> EVTable:
+    with open(path) as file:
+        rows = json.load(file)
+    return {(row['pair'], row['ace'], row['total'], row['upcard']): row['ev'] for row in rows}
+
+
+def save_table(table: EVTable, path: str) -> None:
+    rows = [{'pair': pair, 'ace': ace, 'total': total, 'upcard': upcard, 'ev': evs}
+            for (pair, ace, total, upcard), evs in table.items()]
+    with open(path, 'w') as file:
+        json.dump(rows, file, indent=1)
+    return None
+
+
+def validate(table: EVTable, tree: Optional[Dict] = None) -> Dict[Tuple[bool, bool, int, int], Tuple[str, str, float]]:
+    """
+    This returns the cells where a decision tree, by default basic strategy, differs from the best choice,
+    with the tree's choice, the best choice and the expected value given up.
+    """
+    tree = tree or BasicStrategy.decision_tree
+    differences = {}
+    for (pair, ace, total, upcard), evs in table.items():
+        choice = tree['pair'][pair]['ace'][ace]['total'][total]['upcard'][upcard]
+        best = best_choice(evs)
+        if choice != best:
+            played = evs.get(_ev_key(choice), evs['h'])
+            differences[(pair, ace, total, upcard)] = (choice, best, evs[_ev_key(best)] - played)
+    return differences
+
+
+def _ev_key(choice: str) -> str:
+    return 'd' if choice == 'ds' else choice
+
+
+if __name__ == '__main__':
+    ev_table = ExpectedValue().table(decks=6, penetration=0.75)
+    save_table(ev_table, 'basic_strategy_ev.json')
+    for cell, (choice_, best_, loss) in validate(ev_table).items():
+        print(f'Pair, Ace, Total, Upcard {cell}: basic strategy "{choice_}", best "{best_}", {loss:.4f} per unit bet.')
@@ -0,0 +1,96 @@
+from typing import Any, List, Optional
+
+import numpy as np
+
+from ai.experience_buffer import ExperienceBuffer
+from ai.neural_network import InputMatrix, MultilayerPerceptron, NeuralNetwork, OutputMatrix
+from ai.policy_cache import PolicyCache
+from blackjack_robots.basic_strategy import StrategyTable
+from blackjack_robots.reinforcement_learner import ReinforcementLearner
+from blackjack_simulations.batch_simulator import BatchResult, BatchSimulator, IndexArray
+
+
+class ReinforcementBatchSimulator(BatchSimulator):
+    """
+    This plays the policy of a reinforcement learner at every shoe in lockstep.
+    The states of all pending decisions of a step are one matrix, so the network is propagated once per step,
+    and every decision is added to the experience with its reward to go, as the ReinforcementLearner records it:
+    a decision before a split is given the rewards of both hands, and the insurance decision the net of the round.
+    """
+    actions = ReinforcementLearner.actions
+    surrender_fallback = 's'  # The learner stands when it cannot surrender.
+
+    def __init__(self, neural_network: NeuralNetwork, shoes: int, decks: int = 6, minimum_bet: int = 25,
+                 penetration: float = 0.75, chips: int = 1000, seed: Optional[int] = None,
+                 experience: Optional[ExperienceBuffer] = None):
+        if not neural_network.instantiated:
+            raise ValueError('The argument "neural_network" must be an instantiated "NeuralNetwork" class object.')
+        super().__init__(shoes, decks, minimum_bet, penetration, chips, seed)
+        self.policy = neural_network
+        self.num_features, self.num_targets = 6, len(self.actions)
+        if not self.policy.initiated:
+            self.policy.initialize(self.num_features, self.num_targets)
+        self.policy_cache = PolicyCache(self.policy, ReinforcementLearner.state_low, ReinforcementLearner.state_high)
+        self.experience = experience if experience is not None else \
+            ExperienceBuffer(self.num_features, self.num_targets)
+        self.action_codes = np.array([StrategyTable.codes[action] for action in self.actions], dtype=np.int8)
+        self._insured: List[Any] = []  # These are the shoes, states and actions of the insurance decisions.
+        self._decided: List[Any] = []  # These are the lanes, states and actions of the decisions of the round.
+
+    def play_round(self) -> BatchResult:
+        self._insured, self._decided = [], []
+        result = super().play_round()
+        for shoe, states, actions in self._insured:
+            self.experience.extend(states, actions, result.net[shoe])
+        return result
+
+    def states(self, pair: np.ndarray, hard: np.ndarray, ace: np.ndarray, upcard: np.ndarray,
+               insurance: int = 0) -> InputMatrix:
+        """These are the states of the ReinforcementLearner: pair, ace, hand min, hand max, upcard and insurance."""
+        states = np.empty((len(hard), self.num_features), dtype=np.int64)
+        states[:, 0], states[:, 1], states[:, 2] = pair, ace, hard
+        states[:, 3] = hard + 10 * ace
+        states[:, 4], states[:, 5] = upcard, insurance
+        return states
+
+    def _decide(self, lane: IndexArray, shoe: IndexArray, pair: np.ndarray, hard: np.ndarray,
+                ace: np.ndarray, upcard: np.ndarray) -> np.ndarray[Any, int]:
+        states = self.states(pair, hard, ace, upcard)
+        actions: OutputMatrix = self.policy_cache.forward_propagation(states)
+        self._decided.append((lane, states, actions))
+        return self.action_codes[np.argmax(actions, axis=1)]
+
+    def _insure(self, shoe: IndexArray, hard: np.ndarray, ace: np.ndarray,
+                pair: np.ndarray) -> np.ndarray[Any, bool]:
+        states = self.states(pair, hard, ace, np.full(len(shoe), 11), insurance=1)
+        actions: OutputMatrix = self.policy_cache.forward_propagation(states)
+        self._insured.append((shoe, states, actions))
+        # The learner buys insurance when its policy chooses to hit.
+        return np.argmax(actions, axis=1) == self.actions.index('h')
+
+    def _settle(self, shoe: IndexArray, lane_shoe: IndexArray, lane_parent: IndexArray,
+                lane_net: np.ndarray[Any, np.int64]) -> None:
+        if not self._decided:
+            return None
+        # The rewards of the deepest splits are added up first, so every lane carries the rewards of its subtree.
+        depth = np.zeros(len(lane_parent), dtype=np.intp)
+        split = np.flatnonzero(lane_parent >= 0)
+        while len(split):
+            split_depth = depth[lane_parent[split]] + 1
+            if np.array_equal(split_depth, depth[split]):
+                break
+            depth[split] = split_depth
+        reward_to_go = lane_net.copy()
+        for level in range(depth.max(), 0, -1):
+            lane = np.flatnonzero(depth == level)
+            np.add.at(reward_to_go, lane_parent[lane], reward_to_go[lane])
+        for lane, states, actions in self._decided:
+            self.experience.extend(states, actions, reward_to_go[lane])
+        return None
+
+
+if __name__ == '__main__':
+    simulator = ReinforcementBatchSimulator(MultilayerPerceptron(perceptrons_per_hidden_layer=[30]),
+                                            shoes=10000, chips=2 ** 40, seed=0)
+    print(f'{round(simulator.run(100))} rounds per second.')
+    print(f'{len(simulator.experience)} state-action pairs recorded.')
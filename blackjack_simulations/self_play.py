@@ -0,0 +1,239 @@
+from multiprocessing import Event, Lock, Process
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+from time import sleep, time
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from numpy.random import SeedSequence
+
+from ai.experience_buffer import ExperienceBuffer
+from ai.neural_network import InputMatrix, MultilayerPerceptron, OutputMatrix, TargetMatrix
+from blackjack_simulations.reinforcement_simulator import ReinforcementBatchSimulator
+
+
+Shape = Tuple[int, ...]
+
+
+class SharedExperience:
+    """
+    This is a ring buffer of (state, action probabilities, reward) rows in shared memory,
+    which the actors write to and the learner reads from. The block starts with the number of rows ever written,
+    so a reader can ask for the rows written since its last read, and the oldest rows are written over first.
+    Rows are copied in and out under the lock.
+    """
+
+    def __init__(self, capacity: int, number_of_features: int = 6, number_of_targets: int = 5,
+                 name: Optional[str] = None, lock: Optional[Any] = None):
+        self.capacity = capacity
+        self.lock = lock if lock is not None else Lock()
+        shapes = [(1,), (capacity, number_of_features), (capacity, number_of_targets), (capacity,)]
+        dtypes = [np.int64, np.int64, np.float64, np.int64]
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in zip(shapes, dtypes))
+        self.memory = SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.memory.name
+        arrays, offset = [], 0
+        for shape, dtype in zip(shapes, dtypes):
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset))
+            offset += arrays[-1].nbytes
+        self._written, self.states, self.actions, self.rewards = arrays
+        if name is None:
+            self._written[0] = 0
+
+    @property
+    def written(self) -> int:
+        return int(self._written[0])
+
+    def close(self) -> None:
+        self._written = self.states = self.actions = self.rewards = None
+        self.memory.close()
+        return None
+
+    def read(self, since: int = 0) -> Tuple[InputMatrix, OutputMatrix, np.ndarray[Any, int], int]:
+        """
+        This copies the rows written since a number of rows written, or as many of the newest as are kept,
+        and returns them with the number of rows written so far, which is where the next read starts.
+        """
+        with self.lock:
+            written = self.written
+            rows = np.arange(max(since, written - self.capacity), written) % self.capacity
+            return self.states[rows], self.actions[rows], self.rewards[rows], written
+
+    def unlink(self) -> None:
+        self.memory.unlink()
+        return None
+
+    def write(self, states: InputMatrix, actions: OutputMatrix, rewards: np.ndarray[Any, int]) -> None:
+        # Only the newest rows that fit are kept.
+        states, actions, rewards = states[-self.capacity:], actions[-self.capacity:], rewards[-self.capacity:]
+        with self.lock:
+            rows = (self.written + np.arange(len(rewards))) % self.capacity
+            self.states[rows], self.actions[rows], self.rewards[rows] = states, actions, rewards
+            self._written[0] += len(rewards)
+        return None
+
+
+class SharedWeights:
+    """
+    These are the weights and biases of a network, flattened layer by layer into shared memory,
+    after a version number that the learner increases every time it publishes.
+    """
+
+    def __init__(self, shapes: List[Shape], name: Optional[str] = None, lock: Optional[Any] = None):
+        self.shapes = shapes
+        self.lock = lock if lock is not None else Lock()
+        size = sum(int(np.prod(shape)) for shape in shapes)
+        self.memory = SharedMemory(name=name, create=name is None, size=8 * (size + 1))
+        self.name = self.memory.name
+        self._version = np.ndarray((1,), dtype=np.int64, buffer=self.memory.buf)
+        self.parameters = np.ndarray((size,), dtype=np.float64, buffer=self.memory.buf, offset=8)
+        if name is None:
+            self._version[0] = 0
+        self.loaded = -1  # This is the version last loaded into a network by this process.
+
+    @property
+    def version(self) -> int:
+        return int(self._version[0])
+
+    def close(self) -> None:
+        self._version = self.parameters = None
+        self.memory.close()
+        return None
+
+    def load(self, network: MultilayerPerceptron) -> bool:
+        """This copies the weights into the network if a newer version was published and returns whether it did."""
+        if self.version == self.loaded:
+            return False
+        with self.lock:
+            offset = 0
+            for array_ in _parameters(network):
+                array_[...] = self.parameters[offset:offset + array_.size].reshape(array_.shape)
+                offset += array_.size
+            self.loaded = self.version
+        network.version += 1
+        return True
+
+    def publish(self, network: MultilayerPerceptron) -> None:
+        with self.lock:
+            self.parameters[:] = np.concatenate([array_.ravel() for array_ in _parameters(network)])
+            self._version[0] += 1
+        return None
+
+    def unlink(self) -> None:
+        self.memory.unlink()
+        return None
+
+    @staticmethod
+    def shapes_of(network: MultilayerPerceptron) -> List[Shape]:
+        return [array_.shape for array_ in _parameters(network)]
+
+
+class SelfPlay:
+    """
+    The actors are processes that each play the reinforcement learner's policy at many shoes in lockstep
+    with a frozen copy of the weights, and write the experience to a shared ring buffer.
+    This process is the learner: it trains on the new rows of the buffer with partial_fit
+    and publishes the weights, which the actors load between blocks of rounds.
+    """
+
+    def __init__(self, neural_network: MultilayerPerceptron, actors: Optional[int] = None, shoes: int = 1000,
+                 capacity: int = 2 ** 20, seed: Optional[int] = None, decks: int = 6, minimum_bet: int = 25,
+                 penetration: float = 0.75, rounds_per_sync: int = 10):
+        if not neural_network.initiated:
+            neural_network.initialize(6, 5)
+        self.policy = neural_network
+        self.actors = actors or max(1, cpu_count() - 1)
+        self.shoes = shoes
+        self.capacity = capacity
+        self.seed = seed
+        self.decks = decks
+        self.minimum_bet = minimum_bet
+        self.penetration = penetration
+        self.rounds_per_sync = rounds_per_sync
+        self.rows_trained = 0
+
+    def run(self, updates: int, batch_size: int = 64, learning_rate: float = 0.1, momentum: float = 0.0,
+            publish_every: int = 1, max_time_seconds: float = 60.0) -> int:
+        """This trains for a number of updates, each on the rows written since the last, and returns the rows."""
+        experience = SharedExperience(self.capacity)
+        weights = SharedWeights(SharedWeights.shapes_of(self.policy))
+        weights.publish(self.policy)
+        stop = Event()
+        processes = [Process(target=run_actor, daemon=True,
+                             args=(seed_sequence, experience.name, experience.lock, self.capacity,
+                                   weights.name, weights.lock, weights.shapes, stop, self.shoes,
+                                   self.rounds_per_sync, self.decks, self.minimum_bet, self.penetration))
+                     for seed_sequence in SeedSequence(self.seed).spawn(self.actors)]
+        try:
+            for process in processes:
+                process.start()
+            start, since, update = time(), 0, 0
+            while update < updates and time() - start < max_time_seconds:
+                states, actions, rewards, since = experience.read(since)
+                if not len(rewards):
+                    sleep(0.01)
+                    continue
+                self.policy.partial_fit(states, self.targets(actions, rewards), batch_size, learning_rate,
+                                        momentum=momentum)
+                self.rows_trained += len(rewards)
+                update += 1
+                if update % publish_every == 0:
+                    weights.publish(self.policy)
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+            for shared in [experience, weights]:
+                shared.close()
+                shared.unlink()
+        return self.rows_trained
+
+    @staticmethod
+    def targets(actions: OutputMatrix, rewards: np.ndarray[Any, int]) -> TargetMatrix:
+        """
+        The output of the action that was chosen is moved to one after a positive reward and to zero after
+        a negative one, and the other outputs are kept, so only the choice that was made is learned from.
+        """
+        targets = np.array(actions, dtype=float)
+        chosen = np.argmax(actions, axis=1)
+        rows = np.flatnonzero(rewards != 0)
+        targets[rows, chosen[rows]] = rewards[rows] > 0
+        return targets
+
+
+def run_actor(seed_sequence: SeedSequence, experience_name: str, experience_lock: Any, capacity: int,
+              weights_name: str, weights_lock: Any, shapes: List[Shape], stop: Any, shoes: int,
+              rounds_per_sync: int, decks: int, minimum_bet: int, penetration: float) -> None:
+    """This plays blocks of rounds until it is stopped, loading the newest weights after every block."""
+    experience = SharedExperience(capacity, name=experience_name, lock=experience_lock)
+    weights = SharedWeights(shapes, name=weights_name, lock=weights_lock)
+    # The shapes alternate between weights and biases, and the hidden layers are the columns of the weights.
+    number_of_features, number_of_targets = shapes[0][0], shapes[-1][0]
+    network = MultilayerPerceptron([shape[1] for shape in shapes[::2][:-1]])
+    network.initialize(number_of_features, number_of_targets)
+    weights.load(network)
+    simulator = ReinforcementBatchSimulator(network, shoes, decks, minimum_bet, penetration, chips=2 ** 40,
+                                            seed=seed_sequence,
+                                            experience=ExperienceBuffer(number_of_features, number_of_targets))
+    try:
+        while not stop.is_set():
+            simulator.play(rounds_per_sync)
+            for chunk in simulator.experience.chunks():
+                experience.write(*chunk)
+            simulator.experience.clear()
+            weights.load(network)
+    finally:
+        experience.close()
+        weights.close()
+    return None
+
+
+def _parameters(network: MultilayerPerceptron) -> List[np.ndarray]:
+    return [array_ for layer in network.weights for array_ in [network.weights[layer], network.biases[layer]]]
+
+
+if __name__ == '__main__':
+    self_play = SelfPlay(MultilayerPerceptron(perceptrons_per_hidden_layer=[30]), shoes=2000, seed=0)
+    start_ = time()
+    rows_ = self_play.run(updates=200, max_time_seconds=30)
+    print(f'{rows_} state-action pairs trained on in {time() - start_:.1f} seconds by {self_play.actors} actors.')
@@ -0,0 +1,160 @@
+import os
+from queue import Queue
+from threading import Thread
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+MAGIC = b'BJROUNDS'
+VERSION = 1
+MAX_HANDS = 4
+MAX_CARDS = 12
+# Zero is no card and no decision. Suits are not kept, since they never change a round.
+RANK_CODES = {'A': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
+              'J': 11, 'Q': 12, 'K': 13}
+DECISION_CODES = {'h': 1, 's': 2, 'd': 3, 'y': 4, 'sur': 5}
+ROUND_DTYPE = np.dtype([
+    ('round_number', '<i8'),
+    ('shoe', '<i4'),
+    ('seat', 'u1'),
+    ('hands', 'u1'),  # This is the number of hands the seat finished, which may be more than are kept.
+    ('insured', 'u1'),
+    ('bet', '<i8'),
+    ('net', '<i8'),
+    ('running_count', '<i2'),
+    ('true_count', '<f4'),
+    ('dealer', 'u1', (MAX_CARDS,)),
+    ('cards', 'u1', (MAX_HANDS, MAX_CARDS)),
+    ('decisions', 'u1', (MAX_HANDS, MAX_CARDS)),
+])
+# The header is the magic bytes, the version and the size of a record, so a reader can tell a stale format.
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4')])
+
+
+class RoundLog:
+    """
+    This writes one fixed-width record per seat per round to a binary file. Records are stored in a
+    preallocated buffer, and full buffers are handed to a background thread that writes them,
+    so the game loop only waits on disk when every buffer in the pool is still being written.
+    The hands of a seat are the hands it finished in the order they were played, so the hands a split made
+    replace the hand that was split, and the decisions of a hand are the calls made on it.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 4096, buffers: int = 4):
+        if buffer_size < 1 or buffers < 1:
+            raise ValueError('The arguments "buffer_size" and "buffers" must be positive integers.')
+        self.path = path
+        self.rounds_logged = 0
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(np.array((MAGIC, VERSION, ROUND_DTYPE.itemsize), dtype=HEADER_DTYPE).tobytes())
+        self._free: Queue = Queue()
+        for _ in range(buffers):
+            self._free.put(np.zeros(buffer_size, dtype=ROUND_DTYPE))
+        self._full: Queue = Queue()
+        self._error: Optional[BaseException] = None
+        self._writer = Thread(target=self._write_buffers, name='RoundLog', daemon=True)
+        self._writer.start()
+        self._buffer = self._free.get()
+        self._size = 0
+
+    def __enter__(self) -> 'RoundLog':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+        return None
+
+    @property
+    def closed(self) -> bool:
+        return self._buffer is None
+
+    def close(self) -> None:
+        """This writes the records that are left and waits for the writer to finish."""
+        if self.closed:
+            return None
+        self._hand_over()
+        self._buffer = None
+        self._full.put(None)
+        self._writer.join()
+        self._file.close()
+        self._raise_writer_error()
+        return None
+
+    def flush(self) -> None:
+        """This hands over the records in the buffer and waits until every record so far is on disk."""
+        self._hand_over()
+        self._buffer = self._free.get()
+        self._full.join()
+        self._raise_writer_error()
+        self._file.flush()
+        return None
+
+    def record(self, round_number: int, shoe: int, seat: int, bet: int, net: int, insured: bool,
+               running_count: int, true_count: float, dealer: Sequence[Any], hands: List[Any],
+               calls: Dict[Any, List[str]]) -> None:
+        """The dealer is a sequence of cards, the hands are the seat's hands and the calls map them to decisions."""
+        if self.closed:
+            raise ValueError('The round log is closed.')
+        row = self._buffer[self._size]
+        row['round_number'], row['shoe'], row['seat'] = round_number, shoe, seat
+        row['hands'] = min(len(hands), 255)
+        row['insured'], row['bet'], row['net'] = insured, bet, net
+        row['running_count'], row['true_count'] = running_count, true_count
+        row['dealer'], row['cards'], row['decisions'] = 0, 0, 0
+        dealer_cards = [RANK_CODES[card.rank] for card in dealer[:MAX_CARDS]]
+        row['dealer'][:len(dealer_cards)] = dealer_cards
+        for i, hand in enumerate(hands[:MAX_HANDS]):
+            cards = [RANK_CODES[card.rank] for card in hand.cards[:MAX_CARDS]]
+            row['cards'][i, :len(cards)] = cards
+            decisions = [DECISION_CODES[call] for call in calls.get(hand, [])[:MAX_CARDS]]
+            row['decisions'][i, :len(decisions)] = decisions
+        self._size += 1
+        self.rounds_logged += 1
+        if self._size == len(self._buffer):
+            self._hand_over()
+            self._buffer = self._free.get()
+        return None
+
+    def _hand_over(self) -> None:
+        self._raise_writer_error()
+        if self._size:
+            self._full.put((self._buffer, self._size))
+        else:
+            self._free.put(self._buffer)
+        self._size = 0
+        return None
+
+    def _raise_writer_error(self) -> None:
+        if self._error is not None:
+            raise OSError(f'The round log could not be written to {self.path}.') from self._error
+        return None
+
+    def _write_buffers(self) -> None:
+        while True:
+            item = self._full.get()
+            if item is None:
+                self._full.task_done()
+                return None
+            buffer, size = item
+            try:
+                if self._error is None:
+                    self._file.write(buffer[:size].tobytes())
+            except OSError as error:
+                self._error = error
+            finally:
+                self._free.put(buffer)
+                self._full.task_done()
+
+
+def read_round_log(path: str) -> np.recarray:
+    """This memory-maps the records of a round log, so they are only read from disk as they are used."""
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if not len(header) or header['magic'][0] != MAGIC:
+        raise ValueError(f'{path} is not a round log.')
+    if header['version'][0] != VERSION or header['record_size'][0] != ROUND_DTYPE.itemsize:
+        raise ValueError(f'{path} was written in version {header["version"][0]} of the round log format, '
+                         f'but this is version {VERSION}.')
+    if os.path.getsize(path) == HEADER_DTYPE.itemsize:
+        return np.zeros(0, dtype=ROUND_DTYPE).view(np.recarray)
+    return np.memmap(path, dtype=ROUND_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize).view(np.recarray)
@@ -0,0 +1,70 @@
+import sys
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+CARDS_PER_DECK = 52
+
+
+class ShoeCorpus:
+    """
+    These are shuffled shoes stored as the rows of a .npy file of uint8 card codes, opened as a read-only
+    memory map, so every process that opens the same file shares one copy in the page cache.
+    The code of a card is its index in a deck as Deck.generate makes it, so the code divided by four is the rank
+    in sorted order. A corpus pickles as its path, so it can be handed to worker processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.shoes: np.ndarray[Any, np.uint8] = np.load(path, mmap_mode='r')
+        if self.shoes.dtype != np.uint8 or self.shoes.ndim != 2 or self.shoes.shape[1] % CARDS_PER_DECK:
+            raise ValueError(f'{path} is not a corpus of shoes of uint8 card codes.')
+        self.decks = self.shoes.shape[1] // CARDS_PER_DECK
+
+    def __getitem__(self, shoe: int) -> np.ndarray[Any, np.uint8]:
+        if not 0 <= shoe < len(self.shoes):
+            raise IndexError(f'The corpus {self.path} has {len(self.shoes)} shoes, so there is no shoe {shoe}.')
+        return self.shoes[shoe]
+
+    def __getstate__(self) -> Dict[str, str]:
+        return {'path': self.path}
+
+    def __len__(self) -> int:
+        return len(self.shoes)
+
+    def __setstate__(self, state: Dict[str, str]) -> None:
+        self.__init__(state['path'])
+        return None
+
+    @staticmethod
+    def generate(path: str, shoes: int, decks: int = 6, seed: Optional[int] = None,
+                 chunk_size: int = 2 ** 14) -> 'ShoeCorpus':
+        """This writes the shoes chunk by chunk, shuffling every row of a chunk at once."""
+        corpus = open_memmap(path, mode='w+', dtype=np.uint8, shape=(shoes, decks * CARDS_PER_DECK))
+        rng = np.random.default_rng(seed)
+        codes = np.tile(np.arange(CARDS_PER_DECK, dtype=np.uint8), decks)
+        for start in range(0, shoes, chunk_size):
+            stop = min(shoes, start + chunk_size)
+            corpus[start:stop] = rng.permuted(np.broadcast_to(codes, (stop - start, len(codes))), axis=1)
+        corpus.flush()
+        del corpus
+        return ShoeCorpus(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description='This writes a corpus of shuffled shoes to a .npy file.')
+    parser.add_argument('path')
+    parser.add_argument('--shoes', type=int, default=2 ** 20)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    corpus = ShoeCorpus.generate(args.path, args.shoes, args.decks, args.seed)
+    print(f'{len(corpus)} shoes of {corpus.decks} decks written to {corpus.path}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
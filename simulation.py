@@ -1,17 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from typing import List, Optional, Type
+
+from numpy import mean, percentile
+from numpy.random import SeedSequence, default_rng
+
 from blackjack import Table
+from blackjack_robots.basic_strategy import BasicStrategy
 from blackjack_robots.card_counter import CardCounter
 
+
+class SessionReport:
+
+    def __init__(self, n_games: int, chips: int):
+        self.n_games = n_games
+        self.chips = chips
+        self.final_chips: List[int] = []
+        self.rounds: List[int] = []
+
+    def add(self, final_chips: int, rounds: int) -> None:
+        self.final_chips.append(final_chips)
+        self.rounds.append(rounds)
+        return None
+
+    def merge(self, *args: 'SessionReport') -> 'SessionReport':
+        for report in args:
+            self.final_chips.extend(report.final_chips)
+            self.rounds.extend(report.rounds)
+        return self
+
+    def profit_probability(self) -> float:
+        return mean([chips > self.chips for chips in self.final_chips])
+
+    def sessions(self) -> int:
+        return len(self.final_chips)
+
+    def survival_probability(self) -> float:
+        return mean([rounds >= self.n_games for rounds in self.rounds])
+
+    def show(self, name: str) -> str:
+        p5, p50, p95 = percentile(self.final_chips, [5, 50, 95])
+        return (f'{name} SURVIVED {self.survival_probability():.2%} and PROFITED {self.profit_probability():.2%} '
+                f'of {self.sessions()} sessions of {self.n_games} rounds starting with {self.chips} chips.\n'
+                f'Final chips: 5% {p5:.0f}; 50% {p50:.0f}; 95% {p95:.0f}. '
+                f'Mean rounds: {mean(self.rounds):.1f} ({mean(self.rounds) / 50:.2f} hours).')
+
+
+def run_sessions(seed_sequence: SeedSequence, sessions: int, n_games: int = 1000, chips: int = 1000,
+                 robot: Type[BasicStrategy] = CardCounter, decks: int = 6, minimum_bet: int = 25,
+                 penetration: float = 0.75) -> SessionReport:
+    """This plays the sessions of one shard, one after another, from the shard's own random stream."""
+    rng = default_rng(seed_sequence)
+    report = SessionReport(n_games, chips)
+    for _ in range(sessions):
+        player = robot()
+        player.chips = chips
+        table = Table(players=1, decks=decks, minimum_bet=minimum_bet, penetration=penetration, rng=rng)
+        table.players = [player]
+        table.simulate(condition=lambda: player.rounds < n_games)
+        report.add(player.chips, player.rounds)
+    return report
+
+
+def run_parallel(sessions: int, n_games: int = 1000, chips: int = 1000, robot: Type[BasicStrategy] = CardCounter,
+                 decks: int = 6, minimum_bet: int = 25, penetration: float = 0.75, seed: Optional[int] = None,
+                 shard_size: int = 100, workers: Optional[int] = None) -> SessionReport:
+    """
+    The sessions are split into shards of a fixed size, and each shard is given an independent child seed,
+    so the merged report only depends on the seed and the shard size, not on the number of workers.
+    """
+    shards = [shard_size] * (sessions // shard_size)
+    if sessions % shard_size:
+        shards.append(sessions % shard_size)
+    seed_sequences = SeedSequence(seed).spawn(len(shards))
+    report = SessionReport(n_games, chips)
+    with ProcessPoolExecutor(max_workers=workers or cpu_count()) as executor:
+        futures = [executor.submit(run_sessions, seed_sequence, shard, n_games, chips, robot,
+                                   decks, minimum_bet, penetration)
+                   for seed_sequence, shard in zip(seed_sequences, shards)]
+        report.merge(*(future.result() for future in futures))
+    return report
+
+
 if __name__ == '__main__':
-    card_counter = CardCounter()
-    card_counter.chips = 1000
-    table = Table(players=1, decks=6, minimum_bet=25, penetration=0.75)
-    table.sleep_int = 0
-    table.players = [card_counter]
-    n_games = 1000
-    table.play(condition=lambda: card_counter.rounds < n_games)
-    if card_counter.rounds < n_games:
-        print(f'Card Counter DIED with {card_counter.chips} chips after {card_counter.rounds} rounds '
-              f'and {round(card_counter.rounds / 50, 2)} hours.')
-    else:
-        print(f'Card Counter SURVIVED with {card_counter.chips} after {card_counter.rounds} rounds '
-              f'and {round(card_counter.rounds / 50, 2)} hours.')
+    report_ = run_parallel(sessions=1000, n_games=1000, chips=1000, seed=0)
+    print(report_.show('Card Counter'))
@@ -1,10 +1,10 @@
 from time import sleep
 
-from numpy import hstack, inf, vstack
+from numpy import inf
 
 from ai.neural_network import NeuralNetwork, MultilayerPerceptron
 from blackjack import Card, Hand, Table
-from blackjack_robots.reinforcement_learner import Node, ReinforcementLearner
+from blackjack_robots.reinforcement_learner import ReinforcementLearner
 
 
 class TestPlayer(ReinforcementLearner):
@@ -12,7 +12,7 @@ class TestPlayer(ReinforcementLearner):
     def __init__(self, neural_network: NeuralNetwork = MultilayerPerceptron([30])):
         super().__init__(neural_network)
         self.name = 'Test Player'
-        self.nodes = []
+        self.episodes = []
 
     def ask_for_insurance(self) -> None:
         hand = self.hands[0]
@@ -61,30 +61,18 @@ class TestPlayer(ReinforcementLearner):
         return False
 
     def _reset(self) -> None:
-
-        def recurse(node: Node) -> None:
-            # Leaf nodes are empty.
-            if node.state.any():
-                total_reward = node.calc_reward()
-                self.state_path_matrix = vstack([self.state_path_matrix, node.state])
-                self.action_path_matrix = vstack([self.action_path_matrix, node.action])
-                self.reward_path_array = hstack([self.reward_path_array, total_reward])
-            for child in node.children:
-                recurse(child)
-            return None
-
         if not self.hands:
-            if self.root_node.state.any():
+            if self.episode.decided[0]:
                 if self.insurance:
-                    self.root_node.reward = -self.insurance
+                    self.episode.rewards[0] = -self.insurance
                     self.insurance = 0
-                recurse(self.root_node)
+                self.episode.record(self.experience)
             print(self.state_path_matrix)
             print(self.action_path_matrix)
             print(self.reward_path_array)
-            self.nodes.append(self.root_node)
-            self.current_node = Node()
-            self.root_node = self.current_node
+            self.episodes.append(self.episode.copy())
+            self.episode.reset()
+            self.current_node = 0
         if self.split_queue:
             self.current_node = self.split_queue.pop(0)
         self._your_turn = False
@@ -98,14 +86,7 @@ if __name__ == '__main__':
     table.players = [player]
     table.play()
 
-    def recurse(node: Node, parent_i=0, child_j=1) -> None:
-        print((parent_i, child_j), node.state, node.action, node.reward)
-        parent_i = child_j
-        child_j += 1
-        for child in node.children:
-            recurse(child, parent_i, child_j)
-            child_j += 1
-        return None
-
-    for node_ in player.nodes:
-        recurse(node_)
+    for episode_ in player.episodes:
+        for node_, reward_to_go in enumerate(episode_.reward_to_go()):
+            print((episode_.parents[node_], node_), episode_.states[node_], episode_.actions[node_],
+                  episode_.rewards[node_], reward_to_go)
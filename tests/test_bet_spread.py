@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from blackjack_robots.card_counter import BetSchedule, CardCounter
+from blackjack_simulations.bet_spread import BetSpreadOptimizer
+
+
+def optimizer() -> BetSpreadOptimizer:
+    true_counts = np.arange(-2, 4)
+    return BetSpreadOptimizer(true_counts, np.array([10, 20, 40, 20, 8, 2]),
+                              0.01 * true_counts - 0.005, np.full(len(true_counts), 1.3))
+
+
+def test_flat_bet_statistics():
+    optimizer_ = optimizer()
+    evaluation = optimizer_.evaluation(BetSchedule({0: 1.0}))
+    mean = np.dot(optimizer_.frequency, optimizer_.mean)
+    second_moment = np.dot(optimizer_.frequency, optimizer_.variance + optimizer_.mean ** 2)
+    assert evaluation.win_rate == pytest.approx(mean)
+    assert evaluation.standard_deviation == pytest.approx(np.sqrt(second_moment - mean ** 2))
+    assert evaluation.average_bet == pytest.approx(1.0)
+
+
+def test_search_keeps_within_the_spread_and_risk():
+    optimizer_ = optimizer()
+    schedule, evaluation = optimizer_.search(4, bankroll=2000, max_risk_of_ruin=0.5)
+    assert schedule.units.min() >= 1 and schedule.units.max() <= 4
+    assert evaluation.risk_of_ruin <= 0.5
+    assert evaluation.win_rate > optimizer_.evaluation(BetSchedule({0: 1.0})).win_rate
+    with pytest.raises(ValueError):
+        optimizer_.search(4, max_risk_of_ruin=0.5)
+    with pytest.raises(ValueError):
+        optimizer_.search(4, bankroll=1, max_risk_of_ruin=1e-9)
+
+
+def test_saved_statistics_and_schedules(tmp_path):
+    optimizer_ = optimizer()
+    optimizer_.save(str(tmp_path / 'statistics.npz'))
+    loaded = BetSpreadOptimizer.cached(str(tmp_path / 'statistics.npz'))
+    assert (loaded.mean == optimizer_.mean).all() and (loaded.rounds == optimizer_.rounds).all()
+    schedule, _ = optimizer_.search(4)
+    schedule.save(str(tmp_path / 'schedule.json'))
+    card_counter = CardCounter()
+    card_counter.load_bet_schedule(str(tmp_path / 'schedule.json'))
+    assert card_counter.bet_schedule.as_dict() == schedule.as_dict()
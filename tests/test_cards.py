@@ -0,0 +1,80 @@
+from itertools import product
+
+import pytest
+
+from blackjack import Card, Deck, Hand
+
+
+RANKS = sorted(Deck.ranks)
+
+
+def card(rank: str, face_up: bool = True) -> Card:
+    return Card(rank, '', face_up=face_up)
+
+
+def reference_totals(ranks):
+    """These are all the values of the cards, counting every ace as one or eleven."""
+    values = [[1, 11] if rank == 'A' else [Card.hard_value_map[rank]] for rank in ranks]
+    return {sum(choice) for choice in product(*values)}
+
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_totals_match_every_way_of_counting_aces(size):
+    for ranks in product(RANKS, repeat=size):
+        hand = Hand(*map(card, ranks))
+        totals = reference_totals(ranks)
+        not_bust = [total for total in totals if total <= 21]
+        assert hand.total() == (max(not_bust) if not_bust else min(totals))
+        assert hand.hard == min(totals)
+        assert hand.bust() == (min(totals) > 21)
+        assert hand.soft == ('A' in ranks)
+        assert hand.has_ace() == ('A' in ranks)
+
+
+def test_value_lists_both_totals_of_a_soft_hand():
+    assert Hand(card('A'), card('6')).value.tolist() == [17, 7]
+    assert Hand(card('A'), card('A')).value.tolist() == [12, 2]
+    assert Hand(card('K'), card('6')).value == 16
+
+
+def test_blackjack_and_pairs():
+    for ten in ['10', 'J', 'Q', 'K']:
+        assert Hand(card('A'), card(ten)).blackjack() and Hand(card(ten), card('A')).blackjack()
+    assert not Hand(card('A'), card('9')).blackjack()
+    assert Hand(card('8'), card('8')).pair()
+    assert not Hand(card('K'), card('10')).pair()
+    assert not Hand(card('8'), card('8'), card('8')).pair()
+
+
+def test_face_down_cards_count_once_turned_up():
+    hole = card('A', face_up=False)
+    hand = Hand(card('K'), hole)
+    assert hand.total() == 10 and not hand.soft
+    hole.face_up = True
+    hand.recalc_value()
+    assert hand.total() == 21 and hand.blackjack()
+
+
+def test_adding_cards_updates_the_totals():
+    hand = Hand(card('A'), card('5'))
+    assert hand.total() == 16
+    hand.add(card('9'))
+    assert hand.total() == 15 and hand.hard == 15
+    hand.add(card('7'))
+    assert hand.bust() and hand.total() == 22
+
+
+def test_beat_and_tie():
+    twenty, soft_twenty, nineteen = Hand(card('K'), card('Q')), Hand(card('A'), card('9')), Hand(card('K'), card('9'))
+    bust = Hand(card('K'), card('Q'), card('5'))
+    assert twenty.beat(nineteen) and not nineteen.beat(twenty)
+    assert twenty.tie_with(soft_twenty) and soft_twenty.tie_with(twenty)
+    assert not twenty.beat(soft_twenty)
+    assert nineteen.beat(bust) and not bust.tie_with(bust)
+
+
+def test_cards_and_hands_are_slotted():
+    with pytest.raises(AttributeError):
+        card('A').colour = 'red'
+    with pytest.raises(AttributeError):
+        Hand().colour = 'red'
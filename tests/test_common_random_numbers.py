@@ -0,0 +1,25 @@
+import numpy as np
+
+from blackjack_robots.basic_strategy import BasicStrategy
+from blackjack_robots.card_counter import CardCounter
+from blackjack_simulations.common_random_numbers import StrategyComparison
+
+
+def test_strategies_play_in_lockstep():
+    comparison = StrategyComparison({'basic_strategy': BasicStrategy, 'card_counter': CardCounter}, seed=0, decks=2)
+    comparison.play(300)
+    comparison.play(200)
+    assert comparison.net.shape == (2, 500)
+    assert len(np.unique(comparison.shoe)) > 2
+    dealt = {table.dealer.shoe.deck.cards_dealt for table in comparison.tables}
+    shoes = {table.dealer.shoe_number for table in comparison.tables}
+    assert len(dealt) == 1 and len(shoes) == 1
+    [result] = comparison.compare('basic_strategy')
+    assert result.low <= result.difference <= result.high
+    assert np.allclose(comparison.differences('basic_strategy')['card_counter'].mean(), result.difference)
+
+
+def test_a_strategy_against_itself():
+    comparison = StrategyComparison({'first': BasicStrategy, 'second': BasicStrategy}, seed=1, decks=2)
+    comparison.play(300)
+    assert (comparison.net[0] == comparison.net[1]).all()
@@ -0,0 +1,56 @@
+from numpy.random import default_rng
+import pytest
+
+from blackjack import Card, CountTracker, Table
+from blackjack_robots.basic_strategy import BasicStrategy
+
+
+def card(rank: str) -> Card:
+    return Card(rank, '', face_up=True)
+
+
+def test_every_system_counts_each_card():
+    counter = CountTracker(52)
+    for rank in ['2', '5', '7', '9', 'K', 'A', '4']:
+        counter.count(card(rank))
+        counter.deal()
+    assert counter.running_counts() == {'hi-lo': 1, 'ko': 2, 'hi-opt ii': 4, 'omega ii': 3}
+    assert counter.cards_remaining == 45
+    # There are 45 / 52 = 0.87 decks left, which rounds to 0.75.
+    assert counter.true_count() == pytest.approx(1 / 0.75)
+    assert counter.true_count('omega ii') == pytest.approx(3 / 0.75)
+
+
+def test_a_system_added_during_a_shoe_counts_the_cards_already_seen():
+    counter = CountTracker(52)
+    for rank in ['2', '3', 'K']:
+        counter.count(card(rank))
+    counter.add_system('aces', {11: 1})
+    counter.count(card('A'))
+    assert counter.running_count('aces') == 1 and counter.running_count() == 0
+    counter.reset(104)
+    assert set(counter.running_counts().values()) == {0} and counter.decks_remaining() == 2.0
+
+
+@pytest.mark.parametrize('seeded', [False, True])
+def test_running_count_across_reshuffles(seeded):
+    """Between rounds, the cards counted in the shoe are the discards and the dealer's hand."""
+    player = BasicStrategy()
+    player.chips = 2 ** 40
+    table = Table(players=1, decks=1, minimum_bet=25, penetration=0.75,
+                  **({'seed': 0} if seeded else {'rng': default_rng(0)}))
+    table.players = [player]
+    checked = []
+
+    def condition() -> bool:
+        dealer = table.dealer
+        cards = dealer.tray.take().tolist()
+        dealer.tray.add(*cards)
+        cards += dealer.hand.cards
+        assert dealer.running_count == sum(CountTracker.systems['hi-lo'][card.max_value] for card in cards)
+        assert dealer.counter.cards_remaining == dealer.shoe.deck.card_count() == 52 - len(cards)
+        checked.append(dealer.shoe_number)
+        return player.rounds < 300
+
+    table.simulate(condition)
+    assert len(set(checked)) > 10
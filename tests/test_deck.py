@@ -0,0 +1,91 @@
+from collections import Counter
+
+import numpy as np
+from numpy.random import default_rng
+
+from blackjack import Card, Deck, Tray
+
+
+def deck(seed: int = 0, decks: int = 1) -> Deck:
+    deck_ = Deck(default_rng(seed))
+    for _ in range(decks):
+        deck_.generate()
+    return deck_
+
+
+def faces(cards):
+    return [(card.rank, card.suit) for card in cards]
+
+
+def test_generate_makes_every_card_of_every_deck():
+    deck_ = deck(decks=2)
+    assert deck_.card_count() == 104
+    assert set(Counter(faces(deck_.cards)).values()) == {2} and len(set(faces(deck_.cards))) == 52
+
+
+def test_a_seeded_shuffle_is_a_permutation_that_repeats():
+    first, second, other = deck(1, 6), deck(1, 6), deck(2, 6)
+    for deck_ in [first, second, other]:
+        deck_.shuffle()
+    assert faces(first.cards) == faces(second.cards) != faces(other.cards)
+    assert Counter(faces(first.cards)) == Counter(faces(deck(decks=6).cards))
+
+
+def test_dealing_and_adding_cards():
+    deck_ = deck()
+    order = deck_.cards
+    dealt = [deck_.get_card() for _ in range(50)]
+    assert dealt == order[:50] and deck_.card_count() == 2
+    deck_.add_array(np.array(dealt[:3], dtype=object))
+    assert deck_.cards == order[50:] + dealt[:3] and deck_.cards_dealt == 0
+    for _ in range(5):
+        deck_.get_card()
+    assert deck_.get_card() is None
+
+
+def test_cut_moves_the_top_under_the_bottom():
+    deck_ = deck()
+    order = deck_.cards
+    deck_.cut(0.5)
+    assert deck_.cards == order[25:] + order[:25]
+
+
+def test_collect_and_arrange_use_the_generated_order():
+    deck_ = deck(decks=2)
+    order = deck_.cards
+    deck_.shuffle()
+    deck_.get_card()
+    deck_.add(Card('A', ''))
+    deck_.collect()
+    assert deck_.cards == order
+    codes = default_rng(0).permutation(np.tile(np.arange(52), 2))
+    deck_.arrange(codes)
+    assert faces(deck_.cards) == [faces([order[code]])[0] for code in codes]
+    assert len(set(map(id, deck_.cards))) == 104
+
+
+def test_tray_keeps_the_order_of_discards_as_it_grows():
+    tray = Tray(4, default_rng(0))
+    cards = deck().cards
+    tray.add(*cards[:3])
+    tray.add(*cards[3:10])
+    assert tray.card_count() == 10
+    assert tray.take().tolist() == cards[:10] and tray.card_count() == 0
+    tray.add(*cards[10:20])
+    assert tray.take().tolist() == cards[10:20]
+
+
+def test_tray_shuffle_and_cut():
+    tray = Tray(52, default_rng(0))
+    cards = deck().cards
+    tray.add(*cards[:20])
+    tray.cut(0.5)
+    cut_index = int(19 * 0.5)
+    assert tray.take().tolist() == cards[cut_index:20] + cards[:cut_index]
+    tray.add(*cards)
+    tray.shuffle()
+    shuffled = tray.take().tolist()
+    assert shuffled != cards and sorted(map(id, shuffled)) == sorted(map(id, cards))
+    tray.add(*cards[:5])
+    tray.empty()
+    assert tray.card_count() == 0 and len(tray.take()) == 0
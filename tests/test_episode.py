@@ -0,0 +1,40 @@
+from ai.neural_network import MultilayerPerceptron
+from blackjack import Card, Hand
+from blackjack_robots.reinforcement_learner import Episode, ReinforcementLearner
+
+
+def card(rank: str) -> Card:
+    return Card(rank, '', face_up=True)
+
+
+def test_reward_to_go_adds_up_every_subtree():
+    episode = Episode(6, 5)
+    first = episode.add(0)
+    second = episode.add(0)
+    third = episode.add(first)
+    episode.rewards[[first, second, third]] = [1, -2, 4]
+    assert episode.reward_to_go().tolist() == [3, 5, -2, 4]
+
+
+def test_doubled_split_hand_that_busts():
+    """This plays the calls the dealer would make for a split pair of eights, where the first hand doubles."""
+    learner = ReinforcementLearner(MultilayerPerceptron([4]))
+    learner.chips = 100
+    up_card = card('6')
+    pair = Hand(card('8'), card('8'), bet=10)
+    learner.hands = [pair]
+    learner.decision(pair, up_card)
+    learner.split(pair)
+    first, second = Hand(card('8'), card('6'), bet=10), Hand(card('8'), card('2'), bet=10)
+    learner.hands = [first, second]
+    learner.decision(first, up_card)
+    assert learner.double(first) == 'd'
+    first.add(card('K'))
+    learner.bust(first)
+    assert learner.reward_queue == []
+    learner.decision(second, up_card)
+    learner.stand(second)
+    learner.won(second)
+    # The root splits into nodes 2 and 3, and node 2 doubles into node 4 while node 3 stands into node 5.
+    assert learner.episode.size == 1
+    assert learner.experience.rewards.tolist() == [-10, -20, 10]
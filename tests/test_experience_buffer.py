@@ -0,0 +1,53 @@
+import gc
+import os
+from typing import Optional
+
+import numpy as np
+
+from ai.experience_buffer import ExperienceBuffer
+
+
+def spilling_buffer(spill_directory: Optional[str] = None, first: int = 0) -> ExperienceBuffer:
+    buffer = ExperienceBuffer(2, 3, chunk_size=4, memory_budget=0, spill_directory=spill_directory)
+    buffer.extend(np.arange(first, first + 20).reshape(10, 2), np.ones((10, 3)), np.arange(first, first + 10))
+    return buffer
+
+
+def test_rows_survive_a_spill():
+    with spilling_buffer() as buffer:
+        assert buffer.spilled == 8
+        assert buffer.states.tolist() == np.arange(20).reshape(10, 2).tolist()
+        assert buffer.rewards.tolist() == list(range(10))
+
+
+def test_temporary_spill_directory_is_removed():
+    with spilling_buffer() as buffer:
+        directory = buffer._directory
+        assert os.path.isdir(directory)
+    assert not os.path.exists(directory)
+    assert len(buffer) == 0
+    buffer = spilling_buffer()
+    directory = buffer._directory
+    del buffer
+    gc.collect()
+    assert not os.path.exists(directory)
+
+
+def test_buffers_share_a_spill_directory(tmp_path):
+    first, second = spilling_buffer(str(tmp_path)), spilling_buffer(str(tmp_path), first=100)
+    assert first._directory != second._directory
+    assert os.path.dirname(first._directory) == os.path.dirname(second._directory) == str(tmp_path)
+    assert first.rewards.tolist() == list(range(10))
+    assert second.rewards.tolist() == list(range(100, 110))
+    first.clear()
+    assert os.listdir(tmp_path) == [os.path.basename(second._directory)]
+    assert second.states.tolist() == np.arange(100, 120).reshape(10, 2).tolist()
+    second.close()
+    assert os.path.isdir(tmp_path) and not os.listdir(tmp_path)
+
+
+def test_given_spill_directory_is_kept(tmp_path):
+    (tmp_path / 'experience_0_states.npy').write_bytes(b'')
+    with spilling_buffer(str(tmp_path)) as buffer:
+        assert len(os.listdir(tmp_path)) == 2
+    assert os.listdir(tmp_path) == ['experience_0_states.npy']
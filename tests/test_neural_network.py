@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from ai.neural_network import MultilayerPerceptron
+
+
+def examples(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 30, (2000, 6)), rng.random((2000, 5))
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_training_with_large_weighted_inputs(dtype):
+    """Inputs up to 30 with a step of one push weighted inputs past where exp overflows in float32."""
+    np.random.seed(0)
+    X, Y = examples()
+    network = MultilayerPerceptron([30])
+    network.train(X, Y, learning_rate=1.0, max_epoch=3, dtype=dtype)
+    network.partial_fit(X, Y, epochs=3, momentum=0.9)
+    for layer in network.weights:
+        assert network.weights[layer].dtype == dtype and network.biases[layer].dtype == dtype
+        assert np.isfinite(network.weights[layer]).all() and np.isfinite(network.biases[layer]).all()
+    assert np.isfinite(network.score)
+
+
+def test_activation_saturates_without_overflow():
+    for dtype in [np.float32, np.float64]:
+        output = MultilayerPerceptron.activation(np.array([-1e6, 0.0, 1e6], dtype=dtype))
+        assert output.tolist() == pytest.approx([0.0, 0.5, 1.0])
+
+
+def test_training_lowers_the_error():
+    np.random.seed(1)
+    X = np.random.rand(500, 3)
+    Y = np.stack([X[:, 0] > 0.5, X[:, 1] > X[:, 2]], axis=1).astype(float)
+    network = MultilayerPerceptron([8])
+    network.initialize(3, 2)
+    before = network._score(X, Y)
+    network.partial_fit(X, Y, batch_size=10, learning_rate=1.0, epochs=20)
+    assert network.score < before / 2
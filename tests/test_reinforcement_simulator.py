@@ -0,0 +1,53 @@
+import numpy as np
+
+from ai.neural_network import MultilayerPerceptron
+from blackjack import Deck, Table
+from blackjack_robots.reinforcement_learner import ReinforcementLearner
+from blackjack_simulations.reinforcement_simulator import ReinforcementBatchSimulator
+from shoe_corpus import CARDS_PER_DECK, ShoeCorpus
+
+
+# The player is dealt a ten and a nine, and the dealer a king in the hole and an ace up.
+FIRST_CARDS = ['10', 'K', '9', 'A']
+BATCH_RANKS = {'A': 1, '9': 9, '10': 10, 'K': 13}
+
+
+def always_hit(network: MultilayerPerceptron) -> None:
+    """This makes the policy of the network always hit, which is how the learner buys insurance."""
+    network.weights[1][:], network.biases[1][:] = 0.0, [1.0, 0.0, 0.0, 0.0, 0.0]
+    network.version += 1
+    return None
+
+
+def rigged_codes() -> np.ndarray:
+    """These are the card codes of one deck, starting with the first cards."""
+    ranks = sorted(Deck.ranks)
+    first = [4 * ranks.index(rank) + copy for copy, rank in enumerate(FIRST_CARDS)]
+    rest = [code for code in range(CARDS_PER_DECK) if code not in first]
+    return np.array(first + rest, dtype=np.uint8)
+
+
+def test_insured_hand_against_a_dealer_blackjack(tmp_path):
+    network = MultilayerPerceptron([])
+    np.save(str(tmp_path / 'shoes.npy'), rigged_codes()[None])
+    learner = ReinforcementLearner(network)
+    always_hit(network)
+    learner.chips = 1000
+    table = Table(players=1, decks=1, minimum_bet=10, penetration=0.75, corpus=ShoeCorpus(str(tmp_path / 'shoes.npy')))
+    table.players = [learner]
+    one_round = iter([True, False])
+    [outcome] = table.simulate(lambda: next(one_round))
+
+    simulator = ReinforcementBatchSimulator(network, shoes=1, decks=1, minimum_bet=10, chips=1000, seed=0)
+    ranks = [BATCH_RANKS[rank] for rank in FIRST_CARDS]
+    rest = list(np.repeat(np.arange(1, 14), 4))
+    for rank in ranks:
+        rest.remove(rank)
+    simulator.shoes[0] = ranks + rest
+    result = simulator.play_round()
+
+    assert outcome.net == result.net[0] == 0
+    assert len(learner.experience) == len(simulator.experience) == 1
+    assert learner.experience.states.tolist() == simulator.experience.states.tolist() == [[0, 0, 19, 19, 11, 1]]
+    assert np.allclose(learner.experience.actions, simulator.experience.actions)
+    assert learner.experience.rewards.tolist() == simulator.experience.rewards.tolist() == [0]
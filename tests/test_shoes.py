@@ -0,0 +1,107 @@
+import pickle
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+from blackjack import RoundOutcome, ShoeRng, Table
+from blackjack_robots.card_counter import CardCounter
+from shoe_corpus import ShoeCorpus
+
+
+def counting_table(seed: Optional[int] = None, corpus: Optional[ShoeCorpus] = None) -> Tuple[Table, CardCounter]:
+    player = CardCounter()
+    player.chips = 2 ** 40
+    table = Table(players=1, decks=2, minimum_bet=25, penetration=0.75, seed=seed, corpus=corpus)
+    table.players = [player]
+    return table, player
+
+
+def play(table: Table, player: CardCounter, rounds: int) -> List[RoundOutcome]:
+    return table.simulate(lambda: player.rounds < rounds)
+
+
+def rounds_of(outcomes: List[RoundOutcome]) -> List[Tuple[int, int, float, int]]:
+    """These are the outcomes without the round numbers, which start over at every call to simulate."""
+    return [(outcome.bet, outcome.net, outcome.true_count, outcome.shoe) for outcome in outcomes]
+
+
+def test_shoe_rng_depends_only_on_the_seed_and_the_shoe():
+    first, second = ShoeRng(7), ShoeRng(7)
+    first.generator.random(1000)
+    first.jump(3)
+    second.jump(3)
+    draws = first.generator.random(5).tolist()
+    assert draws == second.generator.random(5).tolist()
+    second.jump(4)
+    assert draws != second.generator.random(5).tolist()
+    second.jump(3)
+    assert draws == second.generator.random(5).tolist()
+
+
+def test_same_seed_same_rounds():
+    assert rounds_of(play(*counting_table(seed=3), 300)) == rounds_of(play(*counting_table(seed=3), 300))
+    assert rounds_of(play(*counting_table(seed=3), 300)) != rounds_of(play(*counting_table(seed=4), 300))
+
+
+def test_jump_plays_the_shoe_again():
+    table, player = counting_table(seed=5)
+    outcomes = play(table, player, 400)
+    shoe = outcomes[-1].shoe - 1
+    rounds = rounds_of([outcome for outcome in outcomes if outcome.shoe == shoe])
+    table, player = counting_table(seed=5)
+    table.jump(shoe)
+    assert rounds_of(play(table, player, len(rounds))) == rounds
+
+
+def test_restore_continues_from_the_checkpoint():
+    table, player = counting_table(seed=9)
+    play(table, player, 123)
+    checkpoint = table.checkpoint()
+    rounds = rounds_of(play(table, player, 200))
+    table, player = counting_table(seed=9)
+    table.restore(checkpoint)
+    assert rounds_of(play(table, player, 200)) == rounds
+
+
+def test_restore_needs_the_same_seed():
+    table, player = counting_table(seed=9)
+    play(table, player, 10)
+    checkpoint = table.checkpoint()
+    with pytest.raises(ValueError):
+        counting_table(seed=10)[0].restore(checkpoint)
+    with pytest.raises(ValueError):
+        Table(players=1, decks=2, minimum_bet=25, penetration=0.75).checkpoint()
+
+
+def test_restore_from_a_corpus(tmp_path):
+    corpus = ShoeCorpus.generate(str(tmp_path / 'shoes.npy'), 20, decks=2, seed=0)
+    table, player = counting_table(corpus=corpus)
+    play(table, player, 77)
+    checkpoint = table.checkpoint()
+    rounds = rounds_of(play(table, player, 100))
+    table, player = counting_table(corpus=ShoeCorpus(corpus.path))
+    table.restore(checkpoint)
+    assert rounds_of(play(table, player, 100)) == rounds
+
+
+def test_corpus_shoes(tmp_path):
+    corpus = ShoeCorpus.generate(str(tmp_path / 'shoes.npy'), 5, decks=2, seed=0, chunk_size=2)
+    assert len(corpus) == 5 and corpus.decks == 2
+    for shoe in range(len(corpus)):
+        assert np.bincount(corpus[shoe], minlength=52).tolist() == [2] * 52
+    assert (pickle.loads(pickle.dumps(corpus))[4] == corpus[4]).all()
+    with pytest.raises(IndexError):
+        corpus[5]
+
+
+def test_running_past_the_end_of_a_corpus(tmp_path):
+    corpus = ShoeCorpus.generate(str(tmp_path / 'shoes.npy'), 2, decks=2, seed=0)
+    table, player = counting_table(corpus=corpus)
+    with pytest.raises(ValueError, match='has 2 shoes'):
+        play(table, player, 1000)
+    assert table.dealer.shoe_number == 1 and not player.hands
+    checkpoint = table.checkpoint()
+    with pytest.raises(ValueError, match='no shoe 2'):
+        table.jump(2)
+    assert table.checkpoint() == checkpoint
@@ -0,0 +1,49 @@
+from typing import List, Optional
+
+import numpy as np
+from numpy.random import default_rng
+
+from blackjack import Player, RoundOutcome, Table
+from blackjack_robots.basic_strategy import BasicStrategy
+from blackjack_robots.card_counter import CardCounter
+from round_log import RoundLog, read_round_log
+
+
+def robot_table(seed: int, rounds: int, log: Optional[RoundLog] = None) -> List[RoundOutcome]:
+    np.random.seed(seed)
+    players: List[Player] = [CardCounter(), BasicStrategy()]
+    for player in players:
+        player.chips = 2 ** 40
+    table = Table(players=2, decks=6, minimum_bet=25, penetration=0.75, rng=default_rng(seed))
+    table.players = players
+    table.log = log
+    return table.simulate(lambda: players[0].rounds < rounds)
+
+
+def test_robots_share_a_table():
+    for seed in range(3):
+        outcomes = robot_table(seed, 2000)
+        assert len(outcomes) == 4000
+        assert [outcome.seat for outcome in outcomes] == [0, 1] * 2000
+
+
+def test_round_log_round_trip(tmp_path):
+    path = str(tmp_path / 'rounds.bin')
+    with RoundLog(path, buffer_size=64, buffers=2) as log:
+        outcomes = robot_table(0, 500, log)
+    records = read_round_log(path)
+    assert len(records) == len(outcomes)
+    assert records.seat.tolist() == [outcome.seat for outcome in outcomes]
+    assert records.round_number.tolist() == [outcome.round_number for outcome in outcomes]
+    assert records.bet.tolist() == [outcome.bet for outcome in outcomes]
+    assert records.net.tolist() == [outcome.net for outcome in outcomes]
+    assert np.allclose(records.true_count, [outcome.true_count for outcome in outcomes])
+    assert (records.hands >= 1).all()
+    assert (records.dealer[:, :2] > 0).all()
+    assert (records.cards[:, 0, :2] > 0).all()
+
+
+def test_empty_round_log(tmp_path):
+    path = str(tmp_path / 'rounds.bin')
+    RoundLog(path).close()
+    assert len(read_round_log(path)) == 0